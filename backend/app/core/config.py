@@ -3,9 +3,108 @@ from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 PROJECT_ROOT = BASE_DIR.parent
-DATA_DIR = PROJECT_ROOT / "data"
-DB_PATH = PROJECT_ROOT / "app.db"
+# Overridable so tools (e.g. the load-test harness) can run against scratch state
+DATA_DIR = Path(os.getenv("DGP_DATA_DIR") or PROJECT_ROOT / "data")
+DB_PATH = Path(os.getenv("DGP_DB_PATH") or PROJECT_ROOT / "app.db")
+ARTIFACTS_DIR = DATA_DIR / "artifacts"
+PROFILES_DIR = DATA_DIR / "profiles"
+RECEIPT_JOBS_DIR = DATA_DIR / "receipt_jobs"
+AUDIT_ARCHIVE_DIR = DATA_DIR / "audit_archive"
+AUDIT_PARQUET_DIR = Path(os.getenv("DGP_AUDIT_PARQUET_DIR") or DATA_DIR / "audit_parquet")
+
+# Shared secret for admin-only endpoints (X-Admin-Key); unset disables them
+ADMIN_API_KEY = os.getenv("DGP_ADMIN_API_KEY") or None
+
+# Rows serialized per chunk when streaming exports
+EXPORT_BATCH_ROWS = int(os.getenv("DGP_EXPORT_BATCH_ROWS", "10000"))
+
+# Compression levels for exports negotiated via Accept-Encoding
+EXPORT_GZIP_LEVEL = int(os.getenv("DGP_EXPORT_GZIP_LEVEL", "6"))
+EXPORT_ZSTD_LEVEL = int(os.getenv("DGP_EXPORT_ZSTD_LEVEL", "3"))
+
+# Pipeline tracing: optional OTLP/JSON span file and tracemalloc peak memory
+TRACE_EXPORT_PATH = os.getenv("DGP_TRACE_EXPORT_PATH") or None
+TRACE_MEMORY = os.getenv("DGP_TRACE_MEMORY", "").lower() in ("1", "true", "yes")
+
+# Stack sampling interval of the on-demand request profiler
+PROFILE_INTERVAL_MS = float(os.getenv("DGP_PROFILE_INTERVAL_MS", "5"))
+
+# Preload the heavy dependencies that are otherwise imported on first use:
+# "background" (or "1") warms up in a thread once the app is serving,
+# "blocking" finishes before startup completes
+WARMUP = os.getenv("DGP_WARMUP", "").lower()
+
+# Signed stream tokens: comma-separated "kid:secret" pairs. The first key signs
+# new tokens; the rest still verify, which allows rotation. Unset keeps the
+# random opaque tokens looked up in the database.
+TOKEN_KEYS = [
+    tuple(pair.split(":", 1))
+    for pair in os.getenv("DGP_TOKEN_KEYS", "").split(",")
+    if ":" in pair
+]
+
+# Seconds between incremental refreshes of the in-memory token revocation set
+TOKEN_REVOCATION_REFRESH_S = float(os.getenv("DGP_TOKEN_REVOCATION_REFRESH_S", "5"))
+
+# Token-bucket read limits as "<requests per second>:<burst>", per token, per
+# stream and across the process; unset disables a limit
+RATE_LIMIT_TOKEN = os.getenv("DGP_RATE_LIMIT_TOKEN") or None
+RATE_LIMIT_STREAM = os.getenv("DGP_RATE_LIMIT_STREAM") or None
+RATE_LIMIT_GLOBAL = os.getenv("DGP_RATE_LIMIT_GLOBAL") or None
+# Requests that would have to wait at most this long are delayed instead of rejected
+RATE_LIMIT_MAX_WAIT_S = float(os.getenv("DGP_RATE_LIMIT_MAX_WAIT_S", "0"))
+# "memory" keeps buckets per process; "sqlite" shares them between workers
+# on one host through DGP_RATE_LIMIT_DB
+RATE_LIMIT_BACKEND = os.getenv("DGP_RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB = Path(os.getenv("DGP_RATE_LIMIT_DB") or DATA_DIR / "ratelimit.db")
+
+# Cap on concurrent pipeline runs per process (0 = unlimited) and how long a
+# request may queue for a slot before getting a 429
+PIPELINE_CONCURRENCY = int(os.getenv("DGP_PIPELINE_CONCURRENCY", "0"))
+PIPELINE_QUEUE_TIMEOUT_S = float(os.getenv("DGP_PIPELINE_QUEUE_TIMEOUT_S", "10"))
+
+# Rendered consent receipts kept in memory (per process), keyed by version
+RECEIPT_CACHE_SIZE = int(os.getenv("DGP_RECEIPT_CACHE_SIZE", "128"))
+# Streamed HTML receipts longer than this (characters) are not cached
+RECEIPT_CACHE_MAX_CHARS = int(os.getenv("DGP_RECEIPT_CACHE_MAX_CHARS", str(1024 * 1024)))
+
+# PDF receipts listing more event rows than this are built by a background
+# job; the request returns 202 with a job to poll
+RECEIPT_BACKGROUND_ROWS = int(os.getenv("DGP_RECEIPT_BACKGROUND_ROWS", "5000"))
+RECEIPT_JOB_WORKERS = int(os.getenv("DGP_RECEIPT_JOB_WORKERS", "2"))
+# Chained audits per Merkle checkpoint
+AUDIT_CHECKPOINT_SIZE = int(os.getenv("DGP_AUDIT_CHECKPOINT_SIZE", "1024"))
+
+# Access audits older than this many days are compacted into daily
+# rollups by the cleanup task (0 disables); rollups are kept for
+# AUDIT_ROLLUP_RETENTION_DAYS (0 keeps them forever)
+AUDIT_COMPACT_AFTER_DAYS = float(os.getenv("DGP_AUDIT_COMPACT_AFTER_DAYS", "30"))
+AUDIT_ROLLUP_RETENTION_DAYS = float(os.getenv("DGP_AUDIT_ROLLUP_RETENTION_DAYS", "0"))
+# Raw rows deleted per compaction transaction
+AUDIT_COMPACT_BATCH = int(os.getenv("DGP_AUDIT_COMPACT_BATCH", "500"))
+# Write compacted rows to gzipped NDJSON in AUDIT_ARCHIVE_DIR first
+AUDIT_COMPACT_ARCHIVE = os.getenv("DGP_AUDIT_COMPACT_ARCHIVE", "").lower() in ("1", "true", "yes")
+
+# Sealed audits of closed months are moved into monthly partition tables by
+# the cleanup task, AUDIT_PARTITION_BATCH rows per transaction. Partitions
+# older than AUDIT_RETENTION_MONTHS are dropped whole (0 keeps them forever).
+AUDIT_PARTITION_BATCH = int(os.getenv("DGP_AUDIT_PARTITION_BATCH", "5000"))
+AUDIT_RETENTION_MONTHS = int(os.getenv("DGP_AUDIT_RETENTION_MONTHS", "0"))
+
+# Append new audits to the Parquet archive in AUDIT_PARQUET_DIR from the
+# cleanup task, before compaction and retention remove any of them
+AUDIT_PARQUET_EXPORT = os.getenv("DGP_AUDIT_PARQUET_EXPORT", "").lower() in ("1", "true", "yes")
+# Audits read per archive batch
+AUDIT_PARQUET_BATCH = int(os.getenv("DGP_AUDIT_PARQUET_BATCH", "50000"))
+
+# Seconds a computed GET /summary is served before it is recomputed
+SUMMARY_TTL_S = float(os.getenv("DGP_SUMMARY_TTL_S", "10"))
+
+# Worker processes rendering batch receipt archives
+RECEIPT_BATCH_WORKERS = int(os.getenv("DGP_RECEIPT_BATCH_WORKERS") or min(4, os.cpu_count() or 1))
+# Finished receipt jobs are purged by cleanup after this many hours
+RECEIPT_JOB_TTL_HOURS = float(os.getenv("DGP_RECEIPT_JOB_TTL_HOURS", "24"))
 
 
 def ensure_data_dir() -> None:
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,278 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Metrics are per process; with several workers each one reports its own
+values and the scraper aggregates them.
+"""
+from __future__ import annotations
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from starlette.routing import compile_path
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # per label set: [bucket counts..., sum, count]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def time(self, **labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(state[-1])}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    return "\n".join(m.render() for m in REGISTRY) + "\n"
+
+
+# Application metrics
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "dgp_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route", "status"),
+)
+HTTP_IN_FLIGHT = Gauge(
+    "dgp_http_requests_in_flight",
+    "HTTP requests currently being served.",
+    ("method", "route"),
+)
+PIPELINE_STAGE_SECONDS = Histogram(
+    "dgp_pipeline_stage_duration_seconds",
+    "Wall time spent in each stream pipeline stage.",
+    ("stage",),
+)
+PIPELINE_ROWS_IN = Counter(
+    "dgp_pipeline_stage_rows_in_total",
+    "Rows entering each stream pipeline stage.",
+    ("stage",),
+)
+PIPELINE_ROWS_OUT = Counter(
+    "dgp_pipeline_stage_rows_out_total",
+    "Rows leaving each stream pipeline stage.",
+    ("stage",),
+)
+AUDIT_WRITES = Counter(
+    "dgp_audit_writes_total",
+    "Audit rows written, by event type.",
+    ("type",),
+)
+TOKEN_VALIDATIONS = Counter(
+    "dgp_token_validations_total",
+    "Stream token validations, by outcome.",
+    ("outcome",),
+)
+CLEANUP_SECONDS = Histogram(
+    "dgp_cleanup_duration_seconds",
+    "Duration of cleanup passes.",
+)
+CACHE_LOOKUPS = Counter(
+    "dgp_cache_lookups_total",
+    "Cache lookups by cache and result (hit/miss).",
+    ("cache", "result"),
+)
+
+ADMISSION_REJECTIONS = Counter(
+    "dgp_admission_rejections_total",
+    "Requests rejected with 429, by the limit that was hit.",
+    ("limit",),
+)
+PIPELINE_SLOTS = Gauge(
+    "dgp_pipeline_slots",
+    "Pipeline runs holding (in_use) or waiting for (queued) a concurrency slot.",
+    ("state",),
+)
+
+
+_ROUTE_PATTERNS: Optional[List[Tuple[Pattern[str], str]]] = None
+
+
+def _route_patterns(app) -> List[Tuple[Pattern[str], str]]:
+    global _ROUTE_PATTERNS
+    if _ROUTE_PATTERNS is None:
+        # Declared path templates, literal-heavy ones first so that e.g.
+        # /audit/maintenance/cleanup wins over /audit/{stream_id}/...
+        templates = {getattr(r, "path", None) for r in getattr(app, "routes", ())}
+        if hasattr(app, "openapi"):
+            templates.update(app.openapi().get("paths", {}).keys())
+        templates.discard(None)
+        ordered = sorted(templates, key=lambda t: (t.count("{"), -len(t)))
+        _ROUTE_PATTERNS = [(compile_path(t)[0], t) for t in ordered]
+    return _ROUTE_PATTERNS
+
+
+def _route_template(scope) -> str:
+    """Route template for a request, used as a bounded-cardinality label."""
+    app = scope.get("app")
+    if app is None:
+        return "<unmatched>"
+    path = scope.get("path", "")
+    for pattern, template in _route_patterns(app):
+        if pattern.match(path):
+            return template
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Record latency and in-flight counts per route template."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = _route_template(scope)
+        status: Optional[int] = None
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method=method, route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec(method=method, route=route)
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=method,
+                route=route,
+                status=str(status or 500),
+            )
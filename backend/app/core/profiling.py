@@ -0,0 +1,190 @@
+"""Opt-in statistical profiling of live requests.
+
+When an admin enables profiling, 1-in-N requests to the stream and receipt
+routes (or any request carrying the profiling header) are sampled by a
+background thread that snapshots every thread's Python stack at a fixed
+interval. Sampling all threads, not just the event loop, is what captures
+pipeline work running in the threadpool. Only one request is profiled at a
+time; others pass through untouched.
+"""
+from __future__ import annotations
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .config import PROFILE_INTERVAL_MS, PROFILES_DIR
+
+PROFILE_HEADER = "x-dgp-profile"
+
+# Routes eligible for profiling
+PROFILED_PATHS = re.compile(r"^/(streams/\d+/(data|export)|audit/\d+/receipt)$")
+
+# Leaf frames of threads that are parked rather than doing work
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+Frame = Tuple[str, str, int]
+
+
+class ProfilingSettings:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.sample_every = 100
+        self.format = "collapsed"
+        self._counter = itertools.count(1)
+        self._active = threading.Lock()
+
+    def as_dict(self) -> Dict[str, object]:
+        return {"enabled": self.enabled, "sampleEvery": self.sample_every, "format": self.format}
+
+    def should_profile(self, path: str, headers: Dict[bytes, bytes]) -> bool:
+        if not self.enabled or not PROFILED_PATHS.match(path):
+            return False
+        if headers.get(PROFILE_HEADER.encode()):
+            return True
+        return self.sample_every > 0 and next(self._counter) % self.sample_every == 0
+
+
+settings = ProfilingSettings()
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="dgp-profiler", daemon=True)
+        self.started = 0.0
+        self.duration = 0.0
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack: List[Frame] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((os.path.basename(code.co_filename), code.co_name, code.co_firstlineno))
+                    frame = frame.f_back
+                if not stack or (stack[0][0], stack[0][1]) in _IDLE_LEAVES:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                thread_name = names.get(thread_id, str(thread_id))
+                self.samples[(thread_name, tuple(reversed(stack)))] += 1
+
+    def collapsed(self) -> str:
+        lines = []
+        for (thread_name, stack), count in self.samples.most_common():
+            frames = ";".join(f"{name} ({file}:{line})" for file, name, line in stack)
+            lines.append(f"{thread_name};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str) -> str:
+        frame_index: Dict[Frame, int] = {}
+        frames = []
+        samples = []
+        weights = []
+        for (_, stack), count in self.samples.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[1], "file": frame[0], "line": frame[2]})
+                indexes.append(frame_index[frame])
+            samples.append(indexes)
+            weights.append(count * self.interval)
+        return json.dumps({
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.duration,
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": name,
+            "exporter": "dataguardian-proxy",
+        })
+
+
+def list_profiles() -> List[str]:
+    if not PROFILES_DIR.exists():
+        return []
+    return sorted((p.name for p in PROFILES_DIR.iterdir() if p.is_file()), reverse=True)
+
+
+def _write_profile(profiler: SamplingProfiler, method: str, path: str, status: Optional[int]) -> Path:
+    PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")
+    stem = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{method}-{slug}-{status or 0}"
+    if settings.format == "speedscope":
+        out = PROFILES_DIR / f"{stem}.speedscope.json"
+        out.write_text(profiler.speedscope(f"{method} {path}"))
+    else:
+        out = PROFILES_DIR / f"{stem}.collapsed"
+        out.write_text(profiler.collapsed())
+    return out
+
+
+class ProfilingMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not settings.enabled:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        if not settings.should_profile(scope["path"], headers):
+            await self.app(scope, receive, send)
+            return
+        # one profile at a time keeps overhead bounded and stacks attributable
+        if not settings._active.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        status: Optional[int] = None
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000.0)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            settings._active.release()
+            _write_profile(profiler, scope["method"], scope["path"], status)
@@ -0,0 +1,13 @@
+import hmac
+
+from fastapi import Header, HTTPException
+
+from .config import ADMIN_API_KEY
+
+
+def require_admin(x_admin_key: str | None = Header(default=None)) -> None:
+    """Dependency guarding admin-only endpoints with the X-Admin-Key header."""
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not x_admin_key or not hmac.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=403, detail="Invalid admin key")
@@ -0,0 +1,49 @@
+"""Optional preloading of dependencies that the app imports lazily.
+
+pandas, numpy, the data_processing module and reportlab are imported on the
+first request that needs them so that cold starts serving only token and
+audit endpoints stay fast. Deployments that would rather pay that cost up
+front set DGP_WARMUP.
+"""
+from __future__ import annotations
+import importlib
+import logging
+import threading
+import time
+from typing import Dict
+
+from .config import WARMUP
+
+logger = logging.getLogger(__name__)
+
+WARMUP_MODULES = (
+    "pandas",
+    "numpy",
+    "app.services.data_processing",
+    "reportlab.platypus",
+    "reportlab.lib.styles",
+    "pyarrow",
+    "zstandard",
+)
+
+
+def warm_up() -> Dict[str, float]:
+    """Import WARMUP_MODULES; returns seconds spent per module."""
+    timings: Dict[str, float] = {}
+    for name in WARMUP_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            # optional dependencies (pyarrow, zstandard) may be absent
+            continue
+        timings[name] = round(time.perf_counter() - start, 4)
+    logger.info("warmup finished in %.3fs: %s", sum(timings.values()), timings)
+    return timings
+
+
+def start_warmup() -> None:
+    if WARMUP in ("1", "true", "yes", "background"):
+        threading.Thread(target=warm_up, name="dgp-warmup", daemon=True).start()
+    elif WARMUP == "blocking":
+        warm_up()
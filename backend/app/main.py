@@ -1,11 +1,19 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .core.db import Base, engine
+from fastapi.responses import PlainTextResponse
+from .core.db import Base, SessionLocal, engine, upgrade_schema
+from .core.metrics import MetricsMiddleware, render_metrics
+from .core.profiling import ProfilingMiddleware
 from .routers import datasets, streams
 from .core.config import ensure_data_dir
+from .core.warmup import start_warmup
 from .routers import tokens as tokens_router
 from .routers import audit as audit_router
 from .routers import rules as rules_router
+from .routers import admin as admin_router
+from .routers import summary as summary_router
+from .services.audit_chain import seal_unchained
+from .services.stream_usage import backfill_stream_usage
 
 app = FastAPI(title="Synthetic Streams Backend")
 
@@ -17,18 +25,36 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(datasets.router, prefix="/datasets", tags=["datasets"])
 app.include_router(rules_router.router, prefix="/rules", tags=["rules"])
 app.include_router(streams.router, prefix="/streams", tags=["streams"])
 app.include_router(tokens_router.router, prefix="/tokens", tags=["tokens"])
 app.include_router(audit_router.router, prefix="/audit", tags=["audit"])
+app.include_router(admin_router.router, prefix="/admin", tags=["admin"])
+app.include_router(summary_router.router, prefix="/summary", tags=["summary"])
 
 @app.on_event("startup")
 async def on_startup():
     ensure_data_dir()
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
+    # chain audits written before the hash chain existed
+    db = SessionLocal()
+    try:
+        seal_unchained(db)
+        backfill_stream_usage(db)
+    finally:
+        db.close()
+    start_warmup()
 
 @app.get("/")
 async def root():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,8 +1,11 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import (
+    Column, Integer, String, DateTime, ForeignKey, Text, Boolean, LargeBinary, UniqueConstraint, event, false,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import JSON
 from ..core.db import Base
+from ..core.metrics import AUDIT_WRITES
 
 
 class Dataset(Base):
@@ -36,8 +39,8 @@ class Stream(Base):
     name = Column(String, nullable=False)
     dataset_id = Column(Integer, ForeignKey("datasets.id"), nullable=False)
     rule_id = Column(Integer, ForeignKey("rules.id"), nullable=True)
-    status = Column(String, default="active", nullable=False)
-    expires_at = Column(DateTime, nullable=True)
+    status = Column(String, default="active", nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     dataset = relationship("Dataset", back_populates="streams")
@@ -53,9 +56,89 @@ class Audit(Base):
     message = Column(Text, nullable=True)
     stream_id = Column(Integer, ForeignKey("streams.id"), nullable=True)
     meta = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # position in the hash chain and the chain hashes (see services.audit_chain)
+    seq = Column(Integer, unique=True, index=True, nullable=True)
+    prev_hash = Column(String(64), nullable=True)
+    hash = Column(String(64), nullable=True)
+
+
+@event.listens_for(Audit, "after_insert")
+def _count_audit_write(mapper, connection, target: Audit) -> None:
+    AUDIT_WRITES.inc(type=target.type)
+
+
+class StreamUsage(Base):
+    """Running access counters per stream (see services.stream_usage)."""
+    __tablename__ = "stream_usage"
+    stream_id = Column(Integer, ForeignKey("streams.id"), primary_key=True)
+    accesses = Column(Integer, nullable=False, default=0)
+    exports = Column(Integer, nullable=False, default=0)
+    not_modified = Column(Integer, nullable=False, default=0)
+    rows_served = Column(Integer, nullable=False, default=0)
+    first_used_at = Column(DateTime, nullable=True)
+    last_used_at = Column(DateTime, nullable=True)
+    last_accessed_at = Column(DateTime, nullable=True)
+    last_exported_at = Column(DateTime, nullable=True)
+
+
+class AuditChainHead(Base):
+    """Single row holding the length and last hash of the audit chain."""
+    __tablename__ = "audit_chain_head"
+    id = Column(Integer, primary_key=True)
+    length = Column(Integer, nullable=False, default=0)
+    last_hash = Column(String(64), nullable=False)
+
+
+class AuditCheckpoint(Base):
+    """Merkle root over a fixed-size block of chained audits."""
+    __tablename__ = "audit_checkpoints"
+    id = Column(Integer, primary_key=True, index=True)
+    start_seq = Column(Integer, unique=True, nullable=False)
+    end_seq = Column(Integer, nullable=False)
+    root = Column(String(64), nullable=False)
+    # concatenated 32-byte leaf hashes, so proofs need no audit rows
+    leaves = Column(LargeBinary, nullable=False)
+    # rows of this block since removed by compaction (see AuditRollup)
+    compacted = Column(Integer, default=0, server_default="0", nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class AuditPartition(Base):
+    """Catalogue of monthly audit partition tables (see services.audit_partitions)."""
+    __tablename__ = "audit_partitions"
+    id = Column(Integer, primary_key=True, index=True)
+    month = Column(String(7), unique=True, nullable=False)
+    rows = Column(Integer, nullable=False, default=0)
+    first_at = Column(DateTime, nullable=False)
+    last_at = Column(DateTime, nullable=False)
+    min_id = Column(Integer, nullable=False)
+    max_id = Column(Integer, nullable=False)
+    min_seq = Column(Integer, nullable=False)
+    max_seq = Column(Integer, nullable=False)
+    # {checkpoint start_seq: rows of that block held here}
+    blocks = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
 
+class AuditRollup(Base):
+    """Per-stream, per-day summary of compacted access audits."""
+    __tablename__ = "audit_rollups"
+    __table_args__ = (UniqueConstraint("stream_id", "day", "type"),)
+    id = Column(Integer, primary_key=True, index=True)
+    stream_id = Column(Integer, ForeignKey("streams.id"), nullable=False, index=True)
+    day = Column(String(10), nullable=False)
+    type = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    rows_served = Column(Integer, nullable=False, default=0)
+    not_modified = Column(Integer, nullable=False, default=0)
+    # {"csv": 3, "parquet": 1}; previews have no format
+    formats = Column(JSON, nullable=True)
+    first_at = Column(DateTime, nullable=False)
+    last_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class Token(Base):
     __tablename__ = "tokens"
     id = Column(Integer, primary_key=True, index=True)
@@ -64,7 +147,9 @@ class Token(Base):
     scope = Column(JSON, nullable=True)
     expires_at = Column(DateTime, nullable=True)
     one_time = Column(Boolean, default=False, nullable=False)
-    revoked = Column(Boolean, default=False, nullable=False)
+    # set once by the first successful read with a one-time token
+    consumed = Column(Boolean, default=False, server_default=false(), nullable=False)
+    revoked = Column(Boolean, default=False, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     stream = relationship("Stream", back_populates="tokens")
\ No newline at end of file
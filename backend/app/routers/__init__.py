@@ -1 +1 @@
-from . import datasets, streams, tokens, audit, rules
\ No newline at end of file
+from . import datasets, streams, tokens, audit, rules, admin
\ No newline at end of file
@@ -0,0 +1,47 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from ..core.config import PROFILES_DIR
+from ..core.db import get_db
+from ..core.profiling import PROFILE_HEADER, list_profiles, settings as profiling
+from ..core.security import require_admin
+from ..models.models import Audit
+from ..schemas.schemas import ProfilingUpdate
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiling")
+async def get_profiling():
+    return {**profiling.as_dict(), "header": PROFILE_HEADER, "profiles": list_profiles()}
+
+
+@router.put("/profiling")
+async def update_profiling(payload: ProfilingUpdate, db: Session = Depends(get_db)):
+    profiling.enabled = payload.enabled
+    if payload.sample_every is not None:
+        profiling.sample_every = payload.sample_every
+    if payload.format is not None:
+        profiling.format = payload.format
+
+    audit = Audit(
+        type="profiling_updated",
+        actor="admin",
+        message=f"Request profiling {'enabled' if payload.enabled else 'disabled'}",
+        stream_id=None,
+        meta=profiling.as_dict(),
+        created_at=datetime.utcnow(),
+    )
+    db.add(audit)
+    db.commit()
+    return profiling.as_dict()
+
+
+@router.get("/profiling/{name}")
+async def download_profile(name: str):
+    path = PROFILES_DIR / name
+    if "/" in name or name.startswith(".") or not path.is_file():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=name)
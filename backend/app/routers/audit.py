@@ -2,22 +2,43 @@ from __future__ import annotations
 from datetime import datetime
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
+from ..core.config import AUDIT_COMPACT_AFTER_DAYS, AUDIT_RETENTION_MONTHS, RECEIPT_BACKGROUND_ROWS
 from ..core.db import get_db
-from ..models.models import Audit, Stream, Dataset, Rule, Token
-from ..schemas.schemas import AuditRead
-from ..utils.receipts import render_receipt_html, generate_receipt_pdf
+from ..core.metrics import AUDIT_WRITES, CACHE_LOOKUPS
+from ..models.models import Audit, AuditCheckpoint, AuditPartition, AuditRollup, Stream
+from ..schemas.schemas import AuditCheckpointRead, AuditRead, ReceiptBatchRequest
+from ..services.audit_chain import chain_head, chain_rows, ensure_checkpoints, verify_range, verify_stream
+from ..services.audit_compaction import compact_audits
+from ..services.audit_parquet import export_audits_parquet, read_watermark
+from ..services.audit_partitions import audit_view, drop_audit_partitions, rotate_audit_partitions
 from ..services.cleanup import cleanup_expired
+from ..services.receipt_batch import RECEIPT_BATCH_LIMIT, iter_receipt_zip
+from ..services.receipt_cache import RECEIPT_AUDIT_TYPE, receipt_cache, receipt_version
+from ..services.receipt_jobs import job_pdf_path, read_job, submit_receipt_job
+from ..services.receipts import build_receipt_pdf, pdf_receipt_rows, stream_receipt_html
 
 router = APIRouter()
 
 
 @router.get("/")
-async def list_audit(db: Session = Depends(get_db)):
-    events: List[Audit] = db.query(Audit).order_by(Audit.created_at.desc()).all()
-    return [
+async def list_audit(
+    since: datetime | None = Query(default=None),
+    until: datetime | None = Query(default=None),
+    db: Session = Depends(get_db),
+):
+    # bounds also limit which monthly partitions are read
+    log = audit_view(db, since=since, until=until)
+    query = db.query(log)
+    if since is not None:
+        query = query.filter(log.created_at >= since)
+    if until is not None:
+        query = query.filter(log.created_at <= until)
+    events: List[Audit] = query.order_by(log.created_at.desc()).all()
+    items = [
         {
             "id": e.id,
             "type": e.type,
@@ -28,50 +49,252 @@ async def list_audit(db: Session = Depends(get_db)):
         }
         for e in events
     ]
+    # Compacted access events appear as one entry per stream, day and type
+    rollup_query = db.query(AuditRollup)
+    if since is not None:
+        rollup_query = rollup_query.filter(AuditRollup.last_at >= since)
+    if until is not None:
+        rollup_query = rollup_query.filter(AuditRollup.first_at <= until)
+    rollups: List[AuditRollup] = rollup_query.all()
+    items.extend(
+        {
+            "id": f"rollup-{r.id}",
+            "type": r.type,
+            "actor": "app",
+            "message": f"{r.count} {r.type} events for stream {r.stream_id} on {r.day} (compacted)",
+            "createdAt": r.last_at.isoformat(),
+            "meta": {
+                "rollup": True,
+                "streamId": r.stream_id,
+                "day": r.day,
+                "count": r.count,
+                "rowsServed": r.rows_served,
+                "notModified": r.not_modified,
+                "formats": r.formats,
+            },
+        }
+        for r in rollups
+    )
+    if rollups:
+        items.sort(key=lambda item: item["createdAt"], reverse=True)
+    return items
+
+
+@router.get("/verify")
+async def verify_audit_log(
+    start: int | None = Query(default=None, ge=1),
+    end: int | None = Query(default=None, ge=1),
+    stream_id: int | None = Query(default=None),
+    db: Session = Depends(get_db),
+):
+    ensure_checkpoints(db)
+    if stream_id is not None:
+        if not db.query(Stream.id).filter(Stream.id == stream_id).first():
+            raise HTTPException(status_code=404, detail="Stream not found")
+        return verify_stream(db, stream_id)
+    if start is None and end is None:
+        raise HTTPException(status_code=400, detail="Provide start/end or stream_id")
+    start = start or 1
+    end = end or chain_head(db)[0]
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    return verify_range(db, start, end)
+
+
+@router.get("/checkpoints", response_model=List[AuditCheckpointRead])
+async def list_checkpoints(db: Session = Depends(get_db)):
+    ensure_checkpoints(db)
+    return db.query(AuditCheckpoint).order_by(AuditCheckpoint.start_seq).all()
 
 
 @router.get("/{stream_id}/receipt")
 async def consent_receipt(
     stream_id: int,
     format: str = Query(default="html", pattern="^(html|pdf)$"),
+    appendix: bool = Query(default=False),
+    background: bool | None = Query(default=None),
+    proofs: bool = Query(default=False),
     db: Session = Depends(get_db),
 ):
     stream: Stream | None = db.query(Stream).filter(Stream.id == stream_id).first()
     if not stream:
         raise HTTPException(status_code=404, detail="Stream not found")
 
-    dataset: Dataset | None = stream.dataset
-    rule: Rule | None = stream.rule
-    tokens: List[Token] = db.query(Token).filter(Token.stream_id == stream_id).all()
-    events: List[Audit] = db.query(Audit).filter(Audit.stream_id == stream_id).order_by(Audit.created_at.asc()).all()
-
-    html = render_receipt_html(stream=stream, dataset=dataset, rule=rule, tokens=tokens, events=events)
+    ensure_checkpoints(db)
+    version = receipt_version(db, stream)
+    cache_key = (stream_id, format, appendix, proofs, version)
+    body = receipt_cache.get(cache_key)
+    CACHE_LOOKUPS.inc(cache="receipt", result="miss" if body is None else "hit")
+    job = None
+    # HTML misses are streamed below; large PDFs are built off the request
+    if body is None and format == "pdf":
+        if background or (background is None and pdf_receipt_rows(db, stream_id, appendix) > RECEIPT_BACKGROUND_ROWS):
+            job = submit_receipt_job(stream_id, appendix)
+        else:
+            body = build_receipt_pdf(db, stream, appendix=appendix)
+            receipt_cache.put(cache_key, body)
 
     # Audit log for receipt generation
+    meta = {"format": format, "appendix": appendix}
+    if job:
+        meta["jobId"] = job["jobId"]
     audit = Audit(
-        type="consent_receipt_generated",
+        type=RECEIPT_AUDIT_TYPE,
         actor="citizen",
         message=f"Consent receipt generated for stream {stream_id}",
         stream_id=stream_id,
-        meta={"format": format},
+        meta=meta,
         created_at=datetime.utcnow(),
     )
     db.add(audit)
     db.commit()
 
+    if job:
+        status_url = f"/audit/receipts/jobs/{job['jobId']}"
+        return JSONResponse(
+            status_code=202,
+            content={**job, "statusUrl": status_url, "downloadUrl": f"{status_url}/download"},
+            headers={"Location": status_url},
+        )
+
     if format == "pdf":
-        pdf_bytes = generate_receipt_pdf(stream=stream, dataset=dataset, rule=rule, tokens=tokens, events=events)
         filename = f"consent_receipt_stream_{stream_id}.pdf"
         return StreamingResponse(
-            iter([pdf_bytes]),
+            iter([body]),
             media_type="application/pdf",
             headers={"Content-Disposition": f"attachment; filename={filename}"},
         )
 
-    return HTMLResponse(content=html)
+    if body is not None:
+        return HTMLResponse(content=body)
+    # Stream the HTML from batched cursors; cached once fully sent
+    return StreamingResponse(
+        receipt_cache.put_streamed(cache_key, stream_receipt_html(stream_id, proofs=proofs)),
+        media_type="text/html; charset=utf-8",
+    )
+
+
+@router.post("/receipts/batch")
+async def receipt_batch(payload: ReceiptBatchRequest, db: Session = Depends(get_db)):
+    if payload.stream_ids is None and payload.status is None and payload.dataset_id is None:
+        raise HTTPException(status_code=400, detail="Provide stream_ids or a filter")
+    if payload.stream_ids is not None and len(payload.stream_ids) > RECEIPT_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {RECEIPT_BATCH_LIMIT} streams per batch")
+    query = db.query(Stream.id)
+    if payload.stream_ids is not None:
+        query = query.filter(Stream.id.in_(payload.stream_ids))
+    if payload.status is not None:
+        query = query.filter(Stream.status == payload.status)
+    if payload.dataset_id is not None:
+        query = query.filter(Stream.dataset_id == payload.dataset_id)
+    stream_ids = [row.id for row in query.order_by(Stream.id).limit(RECEIPT_BATCH_LIMIT + 1)]
+    # requested ids without a stream are reported in the manifest
+    missing: List[int] = []
+    if payload.stream_ids is not None:
+        existing = {row.id for row in db.query(Stream.id).filter(Stream.id.in_(payload.stream_ids))}
+        missing = sorted(set(payload.stream_ids) - existing)
+    if not stream_ids:
+        raise HTTPException(status_code=404, detail="No matching streams")
+    if len(stream_ids) > RECEIPT_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {RECEIPT_BATCH_LIMIT} streams per batch")
+
+    # Core bulk insert skips ORM events, so chain and count the audits here
+    now = datetime.utcnow()
+    audits = [
+        {
+            "type": RECEIPT_AUDIT_TYPE,
+            "actor": "admin",
+            "message": f"Consent receipt generated for stream {stream_id}",
+            "stream_id": stream_id,
+            "meta": {"format": payload.format, "appendix": payload.appendix, "batch": True},
+            "created_at": now,
+        }
+        for stream_id in stream_ids
+    ]
+    chain_rows(db, audits)
+    db.execute(insert(Audit), audits)
+    db.commit()
+    AUDIT_WRITES.inc(len(stream_ids), type=RECEIPT_AUDIT_TYPE)
+
+    filename = f"consent_receipts_{now.strftime('%Y%m%dT%H%M%S')}.zip"
+    return StreamingResponse(
+        iter_receipt_zip(stream_ids, payload.format, payload.appendix, missing),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@router.get("/receipts/jobs/{job_id}")
+async def receipt_job_status(job_id: str):
+    job = read_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Receipt job not found")
+    if job["status"] == "done":
+        job["downloadUrl"] = f"/audit/receipts/jobs/{job_id}/download"
+    return job
+
+
+@router.get("/receipts/jobs/{job_id}/download")
+async def download_receipt_job(job_id: str):
+    job = read_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Receipt job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Receipt job is {job['status']}")
+    return FileResponse(
+        job_pdf_path(job_id),
+        media_type="application/pdf",
+        filename=f"consent_receipt_stream_{job['streamId']}.pdf",
+    )
 
 
 @router.post("/maintenance/cleanup")
 async def force_cleanup(db: Session = Depends(get_db)):
     result = cleanup_expired(db)
-    return result
\ No newline at end of file
+    return result
+
+
+@router.post("/maintenance/compact")
+async def force_compaction(
+    older_than_days: float = Query(default=AUDIT_COMPACT_AFTER_DAYS, ge=0),
+    db: Session = Depends(get_db),
+):
+    return compact_audits(db, older_than_days)
+
+@router.get("/partitions")
+async def list_audit_partitions(db: Session = Depends(get_db)):
+    return [
+        {
+            "month": p.month,
+            "rows": p.rows,
+            "firstAt": p.first_at.isoformat(),
+            "lastAt": p.last_at.isoformat(),
+            "minSeq": p.min_seq,
+            "maxSeq": p.max_seq,
+        }
+        for p in db.query(AuditPartition).order_by(AuditPartition.month)
+    ]
+
+
+@router.post("/maintenance/partitions")
+async def force_partition_rotation(
+    keep_months: int = Query(default=AUDIT_RETENTION_MONTHS, ge=0),
+    db: Session = Depends(get_db),
+):
+    ensure_checkpoints(db)
+    moved = rotate_audit_partitions(db)
+    dropped = drop_audit_partitions(db, keep_months) if keep_months > 0 else []
+    return {"partitioned_audits": moved, "dropped_partitions": dropped}
+
+
+@router.get("/parquet")
+async def audit_parquet_status():
+    return read_watermark()
+
+
+@router.post("/maintenance/parquet")
+async def force_parquet_export(db: Session = Depends(get_db)):
+    try:
+        return export_audits_parquet(db)
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Parquet archive requires pyarrow")
@@ -3,7 +3,6 @@ import hashlib
 from pathlib import Path
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
 from sqlalchemy.orm import Session
-import pandas as pd
 from ..core.db import get_db
 from ..core.config import DATA_DIR
 from ..models.models import Dataset
@@ -26,7 +25,9 @@ async def create_dataset(
     # compute sha256
     sha256 = hashlib.sha256(content).hexdigest()
 
-    # basic validation with pandas
+    # basic validation with pandas (imported lazily to keep startup light)
+    import pandas as pd
+
     try:
         # Attempt to parse to ensure valid CSV
         pd.read_csv(pd.io.common.BytesIO(content), nrows=1)
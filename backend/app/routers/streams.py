@@ -1,24 +1,33 @@
 from datetime import datetime
-from pathlib import Path
 from typing import Any, Dict, List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-import pandas as pd
-from fastapi.responses import StreamingResponse, JSONResponse
-import io
+from fastapi.responses import FileResponse, StreamingResponse
 
 from ..core.db import get_db
-from ..core.config import DATA_DIR
-from ..models.models import Stream, Dataset, Rule, Audit
+from ..core.metrics import CACHE_LOOKUPS
+from ..models.models import Stream, Dataset, Rule, Audit, StreamUsage
 from ..schemas.schemas import StreamDataPreview, StreamCreate, StreamRead
-from ..services.data_processing import (
-    apply_filters,
-    apply_aggregations,
-    apply_obfuscation,
-    select_fields,
-    generate_synthetic,
+from ..services.artifacts import artifact_path, materialize_export, read_artifact_meta, resumes_download
+from ..services.pipeline import (
+    compute_stream_frame,
+    dataset_path,
+    etag_matches,
+    stream_etag,
+    traced_stream_frame,
+)
+from ..services.ratelimit import rate_limiter
+from ..services.stream_usage import stream_usage, usage_dict
+from ..services.token_signing import TokenClaims
+from ..services.tokens import redeem_one_time, release_one_time, validate_stream_token
+from ..utils.compression import compress_chunks, negotiate_encoding
+from ..utils.exports import (
+    COMPRESSIBLE_FORMATS,
+    EXPORT_EXTENSIONS,
+    EXPORT_MEDIA_TYPES,
+    ensure_export_format,
+    iter_export,
 )
-from ..services.tokens import validate_stream_token
 
 router = APIRouter()
 
@@ -67,50 +76,102 @@ async def create_stream(payload: StreamCreate, db: Session = Depends(get_db)):
     return stream
 
 
+@router.get("/usage")
+async def list_stream_usage(db: Session = Depends(get_db)):
+    return [usage_dict(u, u.stream_id) for u in db.query(StreamUsage).order_by(StreamUsage.stream_id)]
+
+
+@router.get("/{stream_id}/usage")
+async def get_stream_usage(stream_id: int, db: Session = Depends(get_db)):
+    if not db.query(Stream.id).filter(Stream.id == stream_id).first():
+        raise HTTPException(status_code=404, detail="Stream not found")
+    return usage_dict(stream_usage(db, stream_id), stream_id)
+
+
+def _materialize(path, dataset: Dataset, rule: Rule | None, format: str):
+    # Another request may have finished materializing while this one queued
+    artifact = read_artifact_meta(path)
+    if artifact is not None:
+        return artifact, None
+    df, trace = traced_stream_frame(dataset, rule, f"materialize:{format}")
+    return materialize_export(path, df, format), trace
+
+
+def _resumable(stream: Stream, format: str, if_range: str | None) -> bool:
+    """A resume only reads an artifact that is already there, and If-Range
+    must not turn it into a full download."""
+    dataset, rule = stream.dataset, stream.rule
+    if not dataset or read_artifact_meta(artifact_path(stream, dataset, rule, format)) is None:
+        return False
+    return if_range is None or if_range == stream_etag(stream, dataset, rule, variant=f"export:{format}:identity")
+
+
+async def _frame_or_release(claims: TokenClaims, *args):
+    """compute_stream_frame(); a one-time token already redeemed by this
+    request is given back when the pipeline slot is refused with 429."""
+    try:
+        return await compute_stream_frame(*args)
+    except HTTPException as exc:
+        if exc.status_code == 429:
+            release_one_time(claims)
+        raise
+
+
 @router.get("/{stream_id}/data", response_model=StreamDataPreview)
-async def get_stream_data(stream_id: int, token: str = Query(...), db: Session = Depends(get_db)):
+async def get_stream_data(
+    stream_id: int,
+    response: Response,
+    token: str = Query(...),
+    if_none_match: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+):
     stream: Stream | None = db.query(Stream).filter(Stream.id == stream_id).first()
     if not stream:
         raise HTTPException(status_code=404, detail="Stream not found")
 
     # Validate token
-    validate_stream_token(db, stream_id=stream_id, token_value=token)
+    claims = validate_stream_token(db, stream_id=stream_id, token_value=token, stream=stream)
+    await rate_limiter.admit(claims.token_id, stream_id, db)
+    redeem_one_time(db, claims)
 
     dataset: Dataset | None = stream.dataset
     if not dataset:
         raise HTTPException(status_code=400, detail="Stream has no dataset")
-
-    csv_path = DATA_DIR / f"{dataset.id}.csv"
-    if not csv_path.exists():
-        raise HTTPException(status_code=404, detail="Dataset file not found")
-
-    # Load dataset with pandas
-    try:
-        df = pd.read_csv(csv_path)
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=f"Failed to read dataset: {exc}")
+    dataset_path(dataset)
 
     rule: Rule | None = stream.rule
-
-    # Apply rule steps
-    if rule and rule.filters:
-        df = apply_filters(df, rule.filters)
-
-    if rule and rule.fields:
-        df = select_fields(df, rule.fields)
-
-    if rule and rule.aggregations:
-        df = apply_aggregations(df, rule.aggregations)
-
-    if rule and rule.obfuscation:
-        df = apply_obfuscation(df, rule.obfuscation)
-
-    # Optional synthetic generation mode (if configured on rule.obfuscation)
-    if rule and rule.obfuscation and rule.obfuscation.get("synthetic"):
-        df = generate_synthetic(df, rule.obfuscation.get("synthetic"))
+    etag = stream_etag(stream, dataset, rule, variant="preview")
+
+    # Client already holds this preview; record the access but skip the pipeline
+    not_modified = etag_matches(if_none_match, etag)
+    if etag:
+        CACHE_LOOKUPS.inc(cache="etag", result="hit" if not_modified else "miss")
+    if not_modified:
+        audit = Audit(
+            type="stream_accessed",
+            actor="app",
+            message=f"Stream {stream.id} data preview accessed (not modified)",
+            stream_id=stream.id,
+            meta={
+                "datasetId": dataset.id,
+                "tokenUsed": True,
+                "notModified": True,
+                "timestamp": datetime.utcnow().isoformat(),
+            },
+            created_at=datetime.utcnow(),
+        )
+        db.add(audit)
+        db.commit()
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    # Give the pooled connection back while waiting on the pipeline; the
+    # loaded stream/dataset stay usable and the audit below reopens one
+    db.close()
 
     # Limit preview to max 50 rows
-    df_preview = df.head(50)
+    df_preview, trace = await _frame_or_release(
+        claims, dataset, rule, "preview", traced_stream_frame, dataset, rule, "preview", 50
+    )
 
     # Build response
     columns = [str(c) for c in df_preview.columns]
@@ -135,6 +196,7 @@ async def get_stream_data(stream_id: int, token: str = Query(...), db: Session =
             "columns": columns,
             "datasetId": dataset.id,
             "tokenUsed": True,
+            "trace": trace.summary(),
             "timestamp": datetime.utcnow().isoformat(),
         },
         created_at=datetime.utcnow(),
@@ -142,51 +204,128 @@ async def get_stream_data(stream_id: int, token: str = Query(...), db: Session =
     db.add(audit)
     db.commit()
 
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
     return preview
 
 
 @router.get("/{stream_id}/export")
 async def export_stream_data(
     stream_id: int,
-    format: str = Query(default="csv", pattern="^(csv|json)$"),
+    format: str = Query(default="csv", pattern="^(csv|json|ndjson|arrow|parquet)$"),
     token: str = Query(...),
+    materialize: bool = Query(default=False),
+    accept_encoding: str | None = Header(default=None),
+    if_none_match: str | None = Header(default=None),
+    range_header: str | None = Header(default=None, alias="range"),
+    if_range: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ):
+    ensure_export_format(format)
+
     # Locate stream and dataset
     stream: Stream | None = db.query(Stream).filter(Stream.id == stream_id).first()
     if not stream:
         raise HTTPException(status_code=404, detail="Stream not found")
 
-    # Validate token
-    validate_stream_token(db, stream_id=stream_id, token_value=token)
+    # Validate token; a one-time token may resume the download it paid for
+    resuming = materialize and resumes_download(range_header)
+    claims = validate_stream_token(db, stream_id=stream_id, token_value=token, stream=stream, allow_consumed=resuming)
+    await rate_limiter.admit(claims.token_id, stream_id, db)
+    resuming = resuming and _resumable(stream, format, if_range)
+    if not resuming:
+        redeem_one_time(db, claims)
 
     dataset: Dataset | None = stream.dataset
     if not dataset:
         raise HTTPException(status_code=400, detail="Stream has no dataset")
+    dataset_path(dataset)
 
-    csv_path = DATA_DIR / f"{dataset.id}.csv"
-    if not csv_path.exists():
-        raise HTTPException(status_code=404, detail="Dataset file not found")
-
-    # Load entire dataset
-    try:
-        df = pd.read_csv(csv_path)
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=f"Failed to read dataset: {exc}")
-
-    # Apply rule transformations (full dataset, no preview limit)
     rule: Rule | None = stream.rule
-    if rule and rule.filters:
-        df = apply_filters(df, rule.filters)
-    if rule and rule.fields:
-        df = select_fields(df, rule.fields)
-    if rule and rule.aggregations:
-        df = apply_aggregations(df, rule.aggregations)
-    if rule and rule.obfuscation:
-        df = apply_obfuscation(df, rule.obfuscation)
-
-    if rule and rule.obfuscation and rule.obfuscation.get("synthetic"):
-        df = generate_synthetic(df, rule.obfuscation.get("synthetic"))
+    # Materialized artifacts are served as identity so byte ranges stay stable
+    encoding = None
+    if format in COMPRESSIBLE_FORMATS and not materialize:
+        encoding = negotiate_encoding(accept_encoding)
+    etag = stream_etag(stream, dataset, rule, variant=f"export:{format}:{encoding or 'identity'}")
+    filename = f"stream_{stream_id}.{EXPORT_EXTENSIONS[format]}"
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "Vary": "Accept-Encoding",
+    }
+    if etag:
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "no-cache"
+
+    # Audited apart from exports, so usage counters and rows served do not
+    # count the download twice
+    if resuming:
+        audit = Audit(
+            type="stream_export_resumed",
+            actor="app",
+            message=f"Stream {stream_id} export as {format} resumed",
+            stream_id=stream.id,
+            meta={
+                "datasetId": dataset.id,
+                "format": format,
+                "tokenUsed": True,
+                "materialized": True,
+                "range": range_header,
+                "timestamp": datetime.utcnow().isoformat(),
+            },
+            created_at=datetime.utcnow(),
+        )
+        db.add(audit)
+        db.commit()
+        del headers["Content-Disposition"]
+        path = artifact_path(stream, dataset, rule, format)
+        return FileResponse(path, media_type=EXPORT_MEDIA_TYPES[format], filename=filename, headers=headers)
+
+    # Client already holds this export; record the access but skip the pipeline
+    not_modified = etag_matches(if_none_match, etag)
+    if etag:
+        CACHE_LOOKUPS.inc(cache="etag", result="hit" if not_modified else "miss")
+    if not_modified:
+        audit = Audit(
+            type="stream_exported",
+            actor="app",
+            message=f"Stream {stream_id} exported as {format} (not modified)",
+            stream_id=stream.id,
+            meta={
+                "datasetId": dataset.id,
+                "format": format,
+                "tokenUsed": True,
+                "notModified": True,
+                "timestamp": datetime.utcnow().isoformat(),
+            },
+            created_at=datetime.utcnow(),
+        )
+        db.add(audit)
+        db.commit()
+        return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "Content-Disposition"})
+
+    # Give the pooled connection back while waiting on the pipeline; the
+    # loaded stream/dataset stay usable and the audit below reopens one
+    db.close()
+
+    trace = None
+    if materialize:
+        path = artifact_path(stream, dataset, rule, format)
+        artifact = read_artifact_meta(path)
+        CACHE_LOOKUPS.inc(cache="export_artifact", result="miss" if artifact is None else "hit")
+        if artifact is None:
+            # keyed on the path: artifacts are per stream, so streams sharing
+            # a dataset and rule must each write their own
+            artifact, trace = await _frame_or_release(
+                claims, dataset, rule, f"materialize:{path}", _materialize, path, dataset, rule, format
+            )
+        row_count = artifact["rowCount"]
+    else:
+        # Apply rule transformations (full dataset, no preview limit)
+        df, trace = await _frame_or_release(
+            claims, dataset, rule, "export", traced_stream_frame, dataset, rule, "export"
+        )
+        row_count = int(df.shape[0])
 
     # Audit logging for export
     audit = Audit(
@@ -196,9 +335,11 @@ async def export_stream_data(
         stream_id=stream.id,
         meta={
             "datasetId": dataset.id,
-            "rowCount": int(df.shape[0]),
+            "rowCount": row_count,
             "format": format,
             "tokenUsed": True,
+            "materialized": materialize,
+            "trace": trace.summary() if trace else None,
             "timestamp": datetime.utcnow().isoformat(),
         },
         created_at=datetime.utcnow(),
@@ -206,20 +347,17 @@ async def export_stream_data(
     db.add(audit)
     db.commit()
 
-    # Return in requested format
-    if format == "json":
-        records = df.to_dict(orient="records")
-        return JSONResponse(content=records)
+    if materialize:
+        # FileResponse handles Range/If-Range and uses sendfile when the server supports it
+        del headers["Content-Disposition"]
+        return FileResponse(path, media_type=EXPORT_MEDIA_TYPES[format], filename=filename, headers=headers)
 
-    # default csv
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False)
-    csv_buffer.seek(0)
-    filename = f"stream_{stream_id}.csv"
+    # Serialize batch by batch in the requested format, compressing each
+    # chunk as it is produced when the client accepts it
+    if encoding:
+        headers["Content-Encoding"] = encoding
     return StreamingResponse(
-        iter([csv_buffer.getvalue()]),
-        media_type="text/csv",
-        headers={
-            "Content-Disposition": f"attachment; filename={filename}",
-        },
-    )
\ No newline at end of file
+        compress_chunks(iter_export(df, format), encoding),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=headers,
+    )
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from ..core.db import get_db
+from ..services.summary import summary_cache
+
+router = APIRouter()
+
+
+@router.get("/")
+async def get_summary(db: Session = Depends(get_db)):
+    return summary_cache.get(db)
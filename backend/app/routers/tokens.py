@@ -5,8 +5,10 @@ from sqlalchemy.orm import Session
 
 from ..core.db import get_db
 from ..models.models import Token, Audit
-from ..schemas.schemas import TokenCreate, TokenRead
-from ..services.tokens import create_token
+from ..schemas.schemas import TokenBulkCreate, TokenCreate, TokenRead
+from ..services.artifacts import invalidate_stream_artifacts
+from ..services.token_signing import revocations
+from ..services.tokens import create_token, create_tokens_bulk
 
 router = APIRouter()
 
@@ -40,6 +42,13 @@ async def issue_token(payload: TokenCreate, db: Session = Depends(get_db)):
     return token
 
 
+@router.post("/bulk", response_model=List[TokenRead])
+async def issue_tokens_bulk(payload: TokenBulkCreate, db: Session = Depends(get_db)):
+    rows = create_tokens_bulk(db, payload.items)
+    db.commit()
+    return rows
+
+
 @router.post("/{token_id}/revoke")
 async def revoke_token(token_id: int, db: Session = Depends(get_db)):
     token: Token | None = db.query(Token).filter(Token.id == token_id).first()
@@ -58,4 +67,8 @@ async def revoke_token(token_id: int, db: Session = Depends(get_db)):
     )
     db.add(audit)
     db.commit()
+    # Other replicas pick this up on their next revocation-set refresh
+    revocations.add(token.id)
+    # Drop materialized exports so nothing built under this grant outlives it
+    invalidate_stream_artifacts(token.stream_id)
     return {"status": "revoked", "tokenId": token.id}
\ No newline at end of file
@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Any, Dict, List, Optional
-from pydantic import BaseModel
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, Field
 
 
 class DatasetCreate(BaseModel):
@@ -78,6 +78,18 @@ class TokenCreate(BaseModel):
     one_time: Optional[bool] = False
 
 
+class TokenBulkItem(BaseModel):
+    stream_id: int
+    count: int = Field(1, ge=1)
+    scope: Optional[List[str]] = None
+    expires_at: Optional[datetime] = None
+    one_time: Optional[bool] = False
+
+
+class TokenBulkCreate(BaseModel):
+    items: List[TokenBulkItem] = Field(..., min_length=1)
+
+
 class TokenRead(BaseModel):
     id: int
     stream_id: int
@@ -85,6 +97,7 @@ class TokenRead(BaseModel):
     scope: Optional[List[str]]
     expires_at: Optional[datetime]
     one_time: bool
+    consumed: bool
     revoked: bool
     created_at: datetime
 
@@ -92,6 +105,21 @@ class TokenRead(BaseModel):
         from_attributes = True
 
 
+class ProfilingUpdate(BaseModel):
+    enabled: bool
+    sample_every: Optional[int] = Field(default=None, ge=0)
+    format: Optional[Literal["collapsed", "speedscope"]] = None
+
+
+class ReceiptBatchRequest(BaseModel):
+    # explicit ids, or every stream matching the filters
+    stream_ids: Optional[List[int]] = None
+    status: Optional[str] = None
+    dataset_id: Optional[int] = None
+    format: Literal["html", "pdf"] = "pdf"
+    appendix: bool = False
+
+
 class AuditRead(BaseModel):
     id: int
     type: str
@@ -102,4 +130,15 @@ class AuditRead(BaseModel):
     meta: Optional[Dict[str, Any]] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class AuditCheckpointRead(BaseModel):
+    id: int
+    start_seq: int
+    end_seq: int
+    root: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,89 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from ..core.config import ARTIFACTS_DIR
+from ..models.models import Dataset, Rule, Stream
+from ..utils.exports import EXPORT_EXTENSIONS, iter_export
+from .pipeline import PIPELINE_VERSION, rule_hash
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def artifact_path(stream: Stream, dataset: Dataset, rule: Optional[Rule], format: str) -> Path:
+    """Location of a stream's materialized export.
+
+    Artifacts live in a per-stream directory so they can be dropped together
+    when the stream expires or one of its tokens is revoked; the file name
+    encodes the dataset, rule and pipeline version it was built from.
+    """
+    name = f"{dataset.sha256[:16]}-{rule_hash(rule)[:16]}-v{PIPELINE_VERSION}.{EXPORT_EXTENSIONS[format]}"
+    return ARTIFACTS_DIR / str(stream.id) / name
+
+
+def _meta_path(path: Path) -> Path:
+    return path.with_name(path.name + ".json")
+
+
+def read_artifact_meta(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    try:
+        with open(_meta_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def resumes_download(range_header: Optional[str]) -> bool:
+    """Whether a Range header only asks for the rest of a download: every
+    range starts past the first byte, so the whole file is never sent."""
+    if not range_header:
+        return False
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not ranges:
+        return False
+    starts = [r.partition("-")[0].strip() for r in ranges.split(",")]
+    return all(start.isdigit() and int(start) > 0 for start in starts)
+
+
+def materialize_export(path: Path, df: pd.DataFrame, format: str) -> Dict[str, Any]:
+    """Write an export to `path` atomically and return its metadata."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp_meta = path.with_name(f".{_meta_path(path).name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in iter_export(df, format):
+                f.write(chunk)
+        meta = {
+            "rowCount": int(df.shape[0]),
+            "format": format,
+            "createdAt": datetime.utcnow().isoformat(),
+        }
+        with open(tmp_meta, "w") as f:
+            json.dump(meta, f)
+        # data first: metadata never describes a file that is not in place
+        os.replace(tmp_path, path)
+        os.replace(tmp_meta, _meta_path(path))
+    finally:
+        for tmp in (tmp_path, tmp_meta):
+            if tmp.exists():
+                tmp.unlink()
+    return meta
+
+
+def invalidate_stream_artifacts(stream_id: int) -> int:
+    """Remove every materialized export of a stream; returns files removed."""
+    stream_dir = ARTIFACTS_DIR / str(stream_id)
+    if not stream_dir.exists():
+        return 0
+    removed = sum(1 for p in stream_dir.iterdir() if not p.name.endswith(".json"))
+    shutil.rmtree(stream_dir, ignore_errors=True)
+    return removed
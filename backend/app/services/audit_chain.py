@@ -0,0 +1,405 @@
+"""Tamper-evident hash chain over the audit log, sealed by Merkle checkpoints.
+
+Every audit row gets a sequence number and ``hash = SHA-256(prev_hash ||
+canonical content)``, so editing, removing or reordering a row breaks every
+later link. Each block of AUDIT_CHECKPOINT_SIZE chained rows is then sealed
+by a checkpoint holding the Merkle root of the block's hashes together with
+the hashes themselves. A single event is shown to belong to the log with a
+log-sized inclusion proof, and verification reads only the requested range
+or stream plus the checkpoints covering it, never the whole table.
+
+New rows are chained in a before_flush hook; Core bulk inserts call
+chain_rows() themselves. The hook bumps the chain head with an UPDATE
+before reading it, which takes SQLite's write lock, so concurrent writers
+append one after another instead of forking the chain.
+"""
+from __future__ import annotations
+import hashlib
+import json
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..core.config import AUDIT_CHECKPOINT_SIZE
+from ..core.db import SessionLocal
+from ..models.models import Audit, AuditChainHead, AuditCheckpoint
+from .audit_partitions import audit_view, stream_audit_view
+
+GENESIS = "0" * 64
+_HEAD_ID = 1
+_CONTENT_FIELDS = ("type", "actor", "message", "stream_id", "meta", "created_at")
+# Failures listed in a verification report
+_MAX_FAILURES = 100
+
+
+def entry_hash(prev_hash: str, seq: int, row: Mapping[str, Any]) -> str:
+    created_at = row["created_at"]
+    content = [seq, row["type"], row.get("actor"), row.get("message"), row.get("stream_id"), row.get("meta"),
+               created_at.isoformat() if created_at else None]
+    payload = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(bytes.fromhex(prev_hash) + payload.encode("utf-8")).hexdigest()
+
+
+def _fields(audit: Audit) -> Dict[str, Any]:
+    return {name: getattr(audit, name) for name in _CONTENT_FIELDS}
+
+
+def _lock_head(conn: Connection) -> Tuple[int, str]:
+    # A write first: SQLite then holds the write lock until commit, so the
+    # head read below cannot go stale before this transaction ends.
+    bumped = conn.execute(
+        update(AuditChainHead).where(AuditChainHead.id == _HEAD_ID).values(length=AuditChainHead.length)
+    )
+    if bumped.rowcount == 0:
+        conn.execute(insert(AuditChainHead).values(id=_HEAD_ID, length=0, last_hash=GENESIS))
+    return conn.execute(
+        select(AuditChainHead.length, AuditChainHead.last_hash).where(AuditChainHead.id == _HEAD_ID)
+    ).one()
+
+
+def _append(conn: Connection, rows: List[Dict[str, Any]]) -> None:
+    """Assign seq, prev_hash and hash to `rows` and advance the chain head."""
+    length, last_hash = _lock_head(conn)
+    for row in rows:
+        if row.get("created_at") is None:
+            row["created_at"] = datetime.utcnow()
+        length += 1
+        row["seq"] = length
+        row["prev_hash"] = last_hash
+        row["hash"] = last_hash = entry_hash(last_hash, length, row)
+    conn.execute(
+        update(AuditChainHead).where(AuditChainHead.id == _HEAD_ID).values(length=length, last_hash=last_hash)
+    )
+
+
+def chain_rows(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Chain audit rows that are about to be inserted with Core insert()."""
+    if rows:
+        _append(db.connection(), rows)
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _chain_new_audits(session: Session, flush_context, instances) -> None:
+    audits = [obj for obj in session.new if isinstance(obj, Audit)]
+    if not audits:
+        return
+    rows = [_fields(audit) for audit in audits]
+    _append(session.connection(), rows)
+    for audit, row in zip(audits, rows):
+        audit.created_at = row["created_at"]
+        audit.seq, audit.prev_hash, audit.hash = row["seq"], row["prev_hash"], row["hash"]
+
+
+def chain_head(db: Session) -> Tuple[int, str]:
+    head = db.query(AuditChainHead.length, AuditChainHead.last_hash).filter(AuditChainHead.id == _HEAD_ID).first()
+    return (head.length, head.last_hash) if head else (0, GENESIS)
+
+
+def seal_unchained(db: Session, batch: int = 1000) -> int:
+    """Append rows written without a chain position (e.g. before the chain
+    existed) to the chain, in id order. Returns the number of rows chained."""
+    chained = 0
+    while True:
+        # lock before selecting, so two workers never chain the same rows
+        _lock_head(db.connection())
+        audits = db.query(Audit).filter(Audit.seq.is_(None)).order_by(Audit.id).limit(batch).all()
+        if not audits:
+            db.commit()
+            return chained
+        rows = [{"id": audit.id, **_fields(audit)} for audit in audits]
+        _append(db.connection(), rows)
+        db.execute(update(Audit), [
+            {"id": row["id"], "seq": row["seq"], "prev_hash": row["prev_hash"], "hash": row["hash"]}
+            for row in rows
+        ])
+        db.commit()
+        chained += len(rows)
+
+
+# --- Merkle trees -----------------------------------------------------------
+# RFC 6962 style domain separation; an odd node is promoted unchanged.
+
+def _leaf(value: bytes) -> bytes:
+    return hashlib.sha256(b"\x00" + value).digest()
+
+
+def _node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def merkle_levels(leaves: List[bytes]) -> List[List[bytes]]:
+    level = [_leaf(value) for value in leaves]
+    levels = [level]
+    while len(level) > 1:
+        parents = [_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+        level = parents
+    return levels
+
+
+def merkle_root(leaves: List[bytes]) -> str:
+    if not leaves:
+        return hashlib.sha256(b"").hexdigest()
+    return merkle_levels(leaves)[-1][0].hex()
+
+
+def inclusion_proof(levels: List[List[bytes]], index: int) -> List[str]:
+    """Sibling hashes from leaf to root, each prefixed L or R by side."""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(("L" if sibling < index else "R") + level[sibling].hex())
+        index //= 2
+    return proof
+
+
+def verify_inclusion(leaf_hash: str, proof: List[str], root: str) -> bool:
+    node = _leaf(bytes.fromhex(leaf_hash))
+    for step in proof:
+        sibling = bytes.fromhex(step[1:])
+        node = _node(sibling, node) if step[0] == "L" else _node(node, sibling)
+    return node.hex() == root
+
+
+def _split_leaves(blob: bytes) -> List[bytes]:
+    return [blob[i:i + 32] for i in range(0, len(blob), 32)]
+
+
+def block_start(seq: int) -> int:
+    return (seq - 1) // AUDIT_CHECKPOINT_SIZE * AUDIT_CHECKPOINT_SIZE + 1
+
+
+class CheckpointIndex:
+    """Checkpoints by block, with Merkle levels built on first use.
+
+    Callers walk seqs in order, so only the last few blocks are kept.
+    """
+
+    max_blocks = 8
+
+    def __init__(self, db: Session) -> None:
+        self.db = db
+        self._blocks: Dict[int, Optional[Tuple[AuditCheckpoint, List[bytes], List[List[bytes]]]]] = {}
+
+    def block(self, seq: int):
+        start = block_start(seq)
+        if start not in self._blocks:
+            if len(self._blocks) >= self.max_blocks:
+                self._blocks.pop(next(iter(self._blocks)))
+            checkpoint = self.db.query(AuditCheckpoint).filter(AuditCheckpoint.start_seq == start).first()
+            if checkpoint is None or seq > checkpoint.end_seq:
+                self._blocks[start] = None
+            else:
+                leaves = _split_leaves(checkpoint.leaves)
+                self._blocks[start] = (checkpoint, leaves, merkle_levels(leaves))
+        return self._blocks[start]
+
+    def proof(self, seq: int) -> Optional[Dict[str, Any]]:
+        block = self.block(seq)
+        if block is None:
+            return None
+        checkpoint, _, levels = block
+        return {
+            "checkpoint": checkpoint.id,
+            "root": checkpoint.root,
+            "proof": inclusion_proof(levels, seq - checkpoint.start_seq),
+        }
+
+
+def ensure_checkpoints(db: Session) -> int:
+    """Seal every complete, intact block that has no checkpoint yet."""
+    length, _ = chain_head(db)
+    sealed_to = db.query(func.max(AuditCheckpoint.end_seq)).scalar() or 0
+    created = 0
+    while sealed_to + AUDIT_CHECKPOINT_SIZE <= length:
+        start, end = sealed_to + 1, sealed_to + AUDIT_CHECKPOINT_SIZE
+        report = verify_range(db, start, end, use_checkpoints=False)
+        if not report["ok"]:
+            # leave a broken block unsealed; /audit/verify reports it
+            break
+        hashes = [bytes.fromhex(h) for (h,) in
+                  db.query(Audit.hash).filter(Audit.seq.between(start, end)).order_by(Audit.seq)]
+        db.add(AuditCheckpoint(
+            start_seq=start,
+            end_seq=end,
+            root=merkle_root(hashes),
+            leaves=b"".join(hashes),
+            created_at=datetime.utcnow(),
+        ))
+        try:
+            db.commit()
+            created += 1
+        except IntegrityError:
+            # sealed concurrently by another worker
+            db.rollback()
+        sealed_to = end
+    return created
+
+
+def _failure(failures: List[Dict[str, Any]], seq: Optional[int], reason: str) -> None:
+    if len(failures) < _MAX_FAILURES:
+        failures.append({"seq": seq, "reason": reason})
+
+
+def _hash_at(db: Session, index: CheckpointIndex, seq: int) -> Optional[str]:
+    if seq == 0:
+        return GENESIS
+    log = audit_view(db, seq_from=seq, seq_to=seq)
+    value = db.query(log.hash).filter(log.seq == seq).scalar()
+    if value is None:
+        block = index.block(seq)
+        if block is not None:
+            value = block[1][seq - block[0].start_seq].hex()
+    return value
+
+
+def _check_checkpoint(block, failures: List[Dict[str, Any]], verified: Dict[int, bool]) -> bool:
+    checkpoint, leaves, levels = block
+    if checkpoint.id not in verified:
+        verified[checkpoint.id] = (
+            len(leaves) == checkpoint.end_seq - checkpoint.start_seq + 1 and levels[-1][0].hex() == checkpoint.root
+        )
+        if not verified[checkpoint.id]:
+            _failure(failures, checkpoint.start_seq, f"checkpoint {checkpoint.id} root does not match its leaves")
+    return verified[checkpoint.id]
+
+
+def _gap(missing: Counter, failures: List[Dict[str, Any]], first: int, last: int, sealed_to: int) -> None:
+    """Record absent entries first..last. In sealed blocks they may have been
+    compacted, which verify_range checks per block against the checkpoint."""
+    seq = first
+    while seq <= min(last, sealed_to):
+        block_end = block_start(seq) + AUDIT_CHECKPOINT_SIZE - 1
+        upto = min(last, block_end)
+        missing[block_start(seq)] += upto - seq + 1
+        seq = upto + 1
+    if seq <= last:
+        _failure(failures, seq, f"entries {seq}..{last} are missing")
+
+
+def verify_range(db: Session, start: int, end: int, use_checkpoints: bool = True) -> Dict[str, Any]:
+    """Recompute the chain over seq `start`..`end`; cost is proportional to
+    the range. Rows inside sealed blocks are also matched against their
+    checkpoint's leaves, and those roots are rechecked. Rows removed by
+    compaction are linked over using the checkpoint's copy of their hash."""
+    length, last_hash = chain_head(db)
+    start, end = max(1, start), min(end, length)
+    sealed_to = db.query(func.max(AuditCheckpoint.end_seq)).scalar() or 0
+    index = CheckpointIndex(db)
+    failures: List[Dict[str, Any]] = []
+    verified: Dict[int, bool] = {}
+    missing: Counter = Counter()
+    prev = _hash_at(db, index, start - 1)
+    expected = start
+    checked = 0
+    log = audit_view(db, seq_from=start, seq_to=end)
+    rows = (
+        db.query(log).filter(log.seq.between(start, end)).order_by(log.seq).yield_per(1000)
+        if start <= end else []
+    )
+    for audit in rows:
+        if audit.seq != expected:
+            _gap(missing, failures, expected, audit.seq - 1, sealed_to)
+            prev = _hash_at(db, index, audit.seq - 1)
+        if prev is not None and audit.prev_hash != prev:
+            _failure(failures, audit.seq, "previous-hash link broken")
+        if entry_hash(audit.prev_hash or GENESIS, audit.seq, _fields(audit)) != audit.hash:
+            _failure(failures, audit.seq, "content does not match hash")
+        if use_checkpoints:
+            block = index.block(audit.seq)
+            if block is not None and _check_checkpoint(block, failures, verified):
+                if block[1][audit.seq - block[0].start_seq].hex() != audit.hash:
+                    _failure(failures, audit.seq, f"hash differs from checkpoint {block[0].id}")
+        prev = audit.hash
+        expected = audit.seq + 1
+        checked += 1
+    if start <= end and expected <= end:
+        _gap(missing, failures, expected, end, sealed_to)
+        prev = _hash_at(db, index, end)
+    if missing:
+        compacted = dict(
+            db.query(AuditCheckpoint.start_seq, AuditCheckpoint.compacted)
+            .filter(AuditCheckpoint.start_seq.in_(list(missing)))
+        )
+        for block, absent in sorted(missing.items()):
+            if absent > compacted.get(block, 0):
+                _failure(failures, block, f"{absent} entries absent from sealed block starting at {block}, "
+                                          f"{compacted.get(block, 0)} compacted")
+    if end == length and start <= end and prev != last_hash:
+        _failure(failures, end, "last entry does not match the chain head")
+    return {
+        "ok": not failures,
+        "start": start,
+        "end": end,
+        "checked": checked,
+        "compacted": sum(missing.values()),
+        "checkpoints": sorted(verified),
+        "failures": failures,
+    }
+
+
+def verify_stream(db: Session, stream_id: int) -> Dict[str, Any]:
+    """Check each of a stream's events against its own hash and its sealed
+    checkpoint; events past the last checkpoint are verified by rechecking
+    the unsealed tail of the chain, which is shorter than one block."""
+    index = CheckpointIndex(db)
+    failures: List[Dict[str, Any]] = []
+    verified: Dict[int, bool] = {}
+    events = 0
+    tail_start: Optional[int] = None
+    log = stream_audit_view(db, stream_id)
+    query = db.query(log).filter(log.stream_id == stream_id, log.seq.isnot(None)).order_by(log.seq)
+    for audit in query.yield_per(1000):
+        events += 1
+        if entry_hash(audit.prev_hash or GENESIS, audit.seq, _fields(audit)) != audit.hash:
+            _failure(failures, audit.seq, "content does not match hash")
+        block = index.block(audit.seq)
+        if block is None:
+            tail_start = audit.seq if tail_start is None else tail_start
+        elif _check_checkpoint(block, failures, verified):
+            if block[1][audit.seq - block[0].start_seq].hex() != audit.hash:
+                _failure(failures, audit.seq, f"hash differs from checkpoint {block[0].id}")
+    unsealed = 0
+    if tail_start is not None:
+        sealed_to = db.query(func.max(AuditCheckpoint.end_seq)).scalar() or 0
+        tail = verify_range(db, sealed_to + 1, chain_head(db)[0], use_checkpoints=False)
+        unsealed = tail["checked"]
+        for failure in tail["failures"]:
+            _failure(failures, failure["seq"], failure["reason"])
+    unchained = db.query(func.count(Audit.id)).filter(Audit.stream_id == stream_id, Audit.seq.is_(None)).scalar()
+    if unchained:
+        _failure(failures, None, f"{unchained} events are not chained")
+    return {
+        "ok": not failures,
+        "streamId": stream_id,
+        "events": events,
+        "checkpoints": sorted(verified),
+        "unsealedChecked": unsealed,
+        "failures": failures,
+    }
+
+
+def stream_checkpoints(db: Session, stream_id: int) -> List[AuditCheckpoint]:
+    """Checkpoints sealing at least one of the stream's events."""
+    log = stream_audit_view(db, stream_id)
+    block = (log.seq - 1) // AUDIT_CHECKPOINT_SIZE
+    starts = [
+        index * AUDIT_CHECKPOINT_SIZE + 1
+        for (index,) in db.query(block).filter(log.stream_id == stream_id, log.seq.isnot(None)).distinct()
+    ]
+    if not starts:
+        return []
+    return (
+        db.query(AuditCheckpoint)
+        .filter(AuditCheckpoint.start_seq.in_(starts))
+        .order_by(AuditCheckpoint.start_seq)
+        .all()
+    )
@@ -0,0 +1,168 @@
+"""Compaction of access audits into per-stream, per-day rollups.
+
+stream_accessed and stream_exported audits are written for every read and
+dominate the audits table. Once older than AUDIT_COMPACT_AFTER_DAYS they are
+folded into AuditRollup rows (counts, rows served, formats) and deleted in
+batches of AUDIT_COMPACT_BATCH, each its own short transaction, so other
+writers never wait long for the lock. Monthly partitions old enough to hold
+such rows are compacted the same way.
+
+Only rows already sealed by a Merkle checkpoint are compacted. The
+checkpoint keeps their hashes, so the chain stays verifiable, and its
+`compacted` count lets verification tell compaction apart from deletion.
+"""
+from __future__ import annotations
+import gzip
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session, aliased
+
+from ..core.config import (
+    AUDIT_ARCHIVE_DIR,
+    AUDIT_COMPACT_ARCHIVE,
+    AUDIT_COMPACT_BATCH,
+    AUDIT_ROLLUP_RETENTION_DAYS,
+)
+from ..models.models import Audit, AuditCheckpoint, AuditRollup
+from .audit_chain import block_start, ensure_checkpoints
+from .audit_partitions import partition_sources, release_rows
+
+# Repetitive per-read events, compacted into rollups and summarized per day
+ACCESS_EVENT_TYPES = ("stream_accessed", "stream_exported")
+
+
+def _day(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d")
+
+
+def _archive(audits: List[Audit]) -> None:
+    """Append the raw rows to one gzip member per day file."""
+    AUDIT_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    by_day: Dict[str, List[str]] = {}
+    for a in audits:
+        by_day.setdefault(_day(a.created_at), []).append(json.dumps({
+            "id": a.id,
+            "seq": a.seq,
+            "hash": a.hash,
+            "prevHash": a.prev_hash,
+            "type": a.type,
+            "actor": a.actor,
+            "message": a.message,
+            "streamId": a.stream_id,
+            "meta": a.meta,
+            "createdAt": a.created_at.isoformat(),
+        }, default=str))
+    for day, lines in by_day.items():
+        with gzip.open(AUDIT_ARCHIVE_DIR / f"audits-{day}.ndjson.gz", "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def _fold(db: Session, audits: List[Audit]) -> int:
+    """Add `audits` into their rollups; returns the number of rollups touched."""
+    groups: Dict[Tuple[int, str, str], Dict[str, Any]] = {}
+    for a in audits:
+        g = groups.setdefault((a.stream_id, _day(a.created_at), a.type), {
+            "count": 0, "rows_served": 0, "not_modified": 0, "formats": Counter(),
+            "first_at": a.created_at, "last_at": a.created_at,
+        })
+        meta = a.meta or {}
+        g["count"] += 1
+        g["rows_served"] += int(meta.get("rowCount") or 0)
+        g["not_modified"] += bool(meta.get("notModified"))
+        if meta.get("format"):
+            g["formats"][meta["format"]] += 1
+        g["first_at"] = min(g["first_at"], a.created_at)
+        g["last_at"] = max(g["last_at"], a.created_at)
+
+    key = tuple_(AuditRollup.stream_id, AuditRollup.day, AuditRollup.type)
+    existing = {(r.stream_id, r.day, r.type): r for r in db.query(AuditRollup).filter(key.in_(list(groups)))}
+    now = datetime.utcnow()
+    for (stream_id, day, kind), g in groups.items():
+        rollup = existing.get((stream_id, day, kind))
+        if rollup is None:
+            rollup = AuditRollup(
+                stream_id=stream_id, day=day, type=kind, count=0, rows_served=0, not_modified=0,
+                formats={}, first_at=g["first_at"], last_at=g["last_at"],
+            )
+            db.add(rollup)
+        rollup.count += g["count"]
+        rollup.rows_served += g["rows_served"]
+        rollup.not_modified += g["not_modified"]
+        rollup.formats = dict(Counter(rollup.formats or {}) + g["formats"])
+        rollup.first_at = min(rollup.first_at, g["first_at"])
+        rollup.last_at = max(rollup.last_at, g["last_at"])
+        rollup.updated_at = now
+    return len(groups)
+
+
+def compact_audits(
+    db: Session,
+    older_than_days: float,
+    batch: int = AUDIT_COMPACT_BATCH,
+    archive: bool = AUDIT_COMPACT_ARCHIVE,
+) -> Dict[str, int]:
+    ensure_checkpoints(db)
+    sealed_to = db.query(func.max(AuditCheckpoint.end_seq)).scalar() or 0
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    compacted = 0
+    rollups = 0
+    # keep the newest row: SQLite would otherwise reuse its id, and the
+    # Parquet archive and revocation cache follow ids
+    newest_id = db.query(func.max(Audit.id)).scalar() or 0
+    for table, partition in partition_sources(db, cutoff):
+        log = Audit if partition is None else aliased(Audit, table, adapt_on_names=True)
+        last_id = 0
+        while True:
+            # keyset pagination: each batch resumes after the last id seen
+            audits = (
+                db.query(log)
+                .filter(
+                    log.id > last_id,
+                    log.id < newest_id,
+                    log.type.in_(ACCESS_EVENT_TYPES),
+                    log.created_at < cutoff,
+                    log.seq <= sealed_to,
+                    log.stream_id.isnot(None),
+                )
+                .order_by(log.id)
+                .limit(batch)
+                .all()
+            )
+            if not audits:
+                break
+            last_id = audits[-1].id
+            if archive:
+                _archive(audits)
+            # Delete first: it takes the write lock, so the rollup
+            # read-modify-write in _fold cannot race another compaction.
+            db.execute(table.delete().where(table.c.id.in_([a.id for a in audits])))
+            rollups += _fold(db, audits)
+            blocks = Counter(block_start(a.seq) for a in audits)
+            for start, n in blocks.items():
+                db.query(AuditCheckpoint).filter(AuditCheckpoint.start_seq == start).update(
+                    {AuditCheckpoint.compacted: AuditCheckpoint.compacted + n}, synchronize_session=False
+                )
+            if partition is not None:
+                release_rows(partition, blocks)
+            db.commit()
+            compacted += len(audits)
+
+    expired_rollups = 0
+    if AUDIT_ROLLUP_RETENTION_DAYS > 0:
+        oldest_day = _day(datetime.utcnow() - timedelta(days=AUDIT_ROLLUP_RETENTION_DAYS))
+        expired_rollups = db.query(AuditRollup).filter(AuditRollup.day < oldest_day).delete(synchronize_session=False)
+        db.commit()
+    return {"compacted_audits": compacted, "updated_rollups": rollups, "expired_rollups": expired_rollups}
+
+
+def stream_rollups(db: Session, stream_id: int) -> List[AuditRollup]:
+    return (
+        db.query(AuditRollup)
+        .filter(AuditRollup.stream_id == stream_id)
+        .order_by(AuditRollup.day, AuditRollup.type)
+        .all()
+    )
@@ -0,0 +1,169 @@
+"""Incremental Parquet archive of the audit log for offline analytics.
+
+Audits are written to AUDIT_PARQUET_DIR as Hive-partitioned Parquet files,
+`month=YYYY-MM/audits-<first id>-<last id>.parquet`, that DuckDB, pandas or
+pyarrow.dataset can read as one table. The known `meta` keys become typed
+`meta_*` columns and the rest is kept as JSON in `meta_extra`.
+
+Each run continues after the last exported id, recorded in
+`_watermark.json` once a batch's files are in place. A run that stops in
+between leaves files past the watermark, which the next run removes before
+writing them again. SQLite assigns ids in commit order, so rows never
+appear behind the watermark.
+"""
+from __future__ import annotations
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sqlalchemy.orm import Session
+
+from ..core.config import AUDIT_PARQUET_BATCH, AUDIT_PARQUET_DIR
+from ..models.models import Audit
+from .audit_partitions import audit_view
+
+_WATERMARK = "_watermark.json"
+_FILE_NAME = re.compile(r"^audits-(\d+)-(\d+)\.parquet$")
+# (meta key, column, kind)
+_META_COLUMNS = (
+    ("datasetId", "meta_dataset_id", "int"),
+    ("ruleId", "meta_rule_id", "int"),
+    ("tokenId", "meta_token_id", "int"),
+    ("rowCount", "meta_row_count", "int"),
+    ("format", "meta_format", "str"),
+    ("notModified", "meta_not_modified", "bool"),
+    ("materialized", "meta_materialized", "bool"),
+    ("tokenUsed", "meta_token_used", "bool"),
+    ("columns", "meta_columns", "list"),
+    ("expires_at", "meta_expires_at", "time"),
+    ("timestamp", "meta_timestamp", "time"),
+    ("trace", "meta_trace", "json"),
+)
+_lock = threading.Lock()
+
+
+def _schema():
+    import pyarrow as pa
+
+    kinds = {
+        "int": pa.int64(),
+        "str": pa.string(),
+        "bool": pa.bool_(),
+        "list": pa.list_(pa.string()),
+        "time": pa.timestamp("us"),
+        "json": pa.string(),
+    }
+    return pa.schema([
+        ("id", pa.int64()),
+        ("seq", pa.int64()),
+        ("type", pa.string()),
+        ("actor", pa.string()),
+        ("message", pa.string()),
+        ("stream_id", pa.int64()),
+        ("created_at", pa.timestamp("us")),
+        ("hash", pa.string()),
+        ("prev_hash", pa.string()),
+        *((column, kinds[kind]) for _, column, kind in _META_COLUMNS),
+        ("meta_extra", pa.string()),
+    ])
+
+
+def _typed(value: Any, kind: str) -> Any:
+    if value is None:
+        return None
+    try:
+        if kind == "int":
+            return int(value)
+        if kind == "bool":
+            return bool(value)
+        if kind == "str":
+            return str(value)
+        if kind == "list":
+            return [str(v) for v in value]
+        if kind == "time":
+            return datetime.fromisoformat(str(value)).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+    return json.dumps(value, default=str)
+
+
+def _columns(audits: List[Audit]) -> Dict[str, List[Any]]:
+    columns: Dict[str, List[Any]] = {name: [] for name in _schema().names}
+    known = {key for key, _, _ in _META_COLUMNS}
+    for a in audits:
+        for name in ("id", "seq", "type", "actor", "message", "stream_id", "created_at", "hash", "prev_hash"):
+            columns[name].append(getattr(a, name))
+        meta = a.meta if isinstance(a.meta, dict) else {}
+        for key, column, kind in _META_COLUMNS:
+            columns[column].append(_typed(meta.get(key), kind))
+        extra = {k: v for k, v in meta.items() if k not in known}
+        columns["meta_extra"].append(json.dumps(extra, default=str) if extra else None)
+    return columns
+
+
+def read_watermark() -> Dict[str, Any]:
+    try:
+        return json.loads((AUDIT_PARQUET_DIR / _WATERMARK).read_text())
+    except (OSError, ValueError):
+        return {"lastId": 0, "files": 0, "rows": 0, "updatedAt": None}
+
+
+def _write_watermark(state: Dict[str, Any]) -> None:
+    tmp = AUDIT_PARQUET_DIR / f".{_WATERMARK}.{uuid.uuid4().hex}.tmp"
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, AUDIT_PARQUET_DIR / _WATERMARK)
+
+
+def _remove_unrecorded(last_id: int) -> None:
+    """Drop files an interrupted run wrote past the watermark."""
+    for path in AUDIT_PARQUET_DIR.glob("month=*/*"):
+        match = _FILE_NAME.match(path.name)
+        if (match and int(match.group(1)) > last_id) or path.name.endswith(".tmp"):
+            path.unlink(missing_ok=True)
+
+
+def _write_file(path: Path, audits: List[Audit]) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    pq.write_table(pa.Table.from_pydict(_columns(audits), schema=_schema()), tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+def export_audits_parquet(db: Session, batch: int = AUDIT_PARQUET_BATCH) -> Dict[str, Any]:
+    """Write audits newer than the watermark; raises ImportError without pyarrow."""
+    import pyarrow  # noqa: F401
+
+    with _lock:
+        AUDIT_PARQUET_DIR.mkdir(parents=True, exist_ok=True)
+        state = read_watermark()
+        _remove_unrecorded(state["lastId"])
+        exported = 0
+        files = 0
+        while True:
+            log = audit_view(db, after_id=state["lastId"])
+            audits = db.query(log).filter(log.id > state["lastId"]).order_by(log.id).limit(batch).all()
+            if not audits:
+                break
+            by_month: Dict[str, List[Audit]] = {}
+            for a in audits:
+                by_month.setdefault(a.created_at.strftime("%Y-%m"), []).append(a)
+            for month, rows in by_month.items():
+                _write_file(AUDIT_PARQUET_DIR / f"month={month}" / f"audits-{rows[0].id}-{rows[-1].id}.parquet", rows)
+            files += len(by_month)
+            exported += len(audits)
+            state = {
+                "lastId": audits[-1].id,
+                "files": state["files"] + len(by_month),
+                "rows": state["rows"] + len(audits),
+                "updatedAt": datetime.utcnow().isoformat(),
+            }
+            _write_watermark(state)
+        return {"exported_audits": exported, "written_files": files, "last_id": state["lastId"]}
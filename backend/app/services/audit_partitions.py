@@ -0,0 +1,198 @@
+"""Monthly partitions of the audit log.
+
+New audits are written to the `audits` table. The cleanup task moves sealed
+rows from closed months into one table per month (`audits_YYYY_MM`), and
+the AuditPartition catalogue records each table's time, id and seq bounds.
+Reads go through audit_view(), which maps the Audit entity onto the
+`audits` table plus only those partitions whose bounds can match, so
+callers keep using Audit's attributes and time-bounded queries never open
+the other months.
+
+Retention drops whole partitions: DROP TABLE plus one catalogue row,
+however many audits the month held. Partitions only ever hold rows sealed
+by a checkpoint, whose `compacted` count is raised by the rows dropped so
+chain verification still links over them.
+"""
+from __future__ import annotations
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import Column, Index, MetaData, Table, func, select, union_all
+from sqlalchemy.orm import Session, aliased
+
+from ..core.config import AUDIT_CHECKPOINT_SIZE, AUDIT_PARTITION_BATCH
+from ..models.models import Audit, AuditCheckpoint, AuditPartition, Stream
+
+# Partition tables are created at runtime, so they live outside Base.metadata
+# (create_all and upgrade_schema leave them alone).
+_partition_metadata = MetaData()
+_COLUMNS = [c.name for c in Audit.__table__.columns]
+
+
+def _month(value: datetime) -> str:
+    return value.strftime("%Y-%m")
+
+
+def _month_start(value: datetime, months_back: int = 0) -> datetime:
+    index = value.year * 12 + value.month - 1 - months_back
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_table(month: str) -> Table:
+    name = "audits_" + month.replace("-", "_")
+    table = _partition_metadata.tables.get(name)
+    if table is None:
+        # same columns as `audits`, without the foreign key: retention drops
+        # whole months independently of streams
+        table = Table(
+            name,
+            _partition_metadata,
+            *(Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable) for c in Audit.__table__.columns),
+        )
+        Index(f"ix_{name}_stream_id", table.c.stream_id)
+        Index(f"ix_{name}_created_at", table.c.created_at)
+        Index(f"ix_{name}_seq", table.c.seq, unique=True)
+    return table
+
+
+def audit_view(
+    db: Session,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    seq_from: Optional[int] = None,
+    seq_to: Optional[int] = None,
+    after_id: Optional[int] = None,
+):
+    """The Audit entity over `audits` and the partitions that may hold rows
+    within the given bounds. The bounds only prune partitions; callers still
+    filter on them. Returns Audit itself when no partition applies."""
+    query = db.query(AuditPartition.month)
+    if since is not None:
+        query = query.filter(AuditPartition.last_at >= since)
+    if until is not None:
+        query = query.filter(AuditPartition.first_at <= until)
+    if seq_from is not None:
+        query = query.filter(AuditPartition.max_seq >= seq_from)
+    if seq_to is not None:
+        query = query.filter(AuditPartition.min_seq <= seq_to)
+    if after_id is not None:
+        query = query.filter(AuditPartition.max_id > after_id)
+    months = [m for (m,) in query.order_by(AuditPartition.month)]
+    if not months:
+        return Audit
+    tables = [partition_table(m) for m in months] + [Audit.__table__]
+    log = union_all(*(select(*(t.c[name] for name in _COLUMNS)) for t in tables)).subquery("audit_log")
+    return aliased(Audit, log, adapt_on_names=True)
+
+
+def stream_audit_view(db: Session, stream_id: int):
+    """audit_view() limited to the months since the stream was created."""
+    created_at = db.query(Stream.created_at).filter(Stream.id == stream_id).scalar()
+    return audit_view(db, since=created_at)
+
+
+def partition_state(db: Session):
+    """Changes whenever rows are moved into, or dropped with, a partition."""
+    return db.query(func.count(AuditPartition.id), func.coalesce(func.sum(AuditPartition.rows), 0)).one()
+
+
+def _record(db: Session, month: str, table: Table, ids: List[int]) -> None:
+    block = (table.c.seq - 1) // AUDIT_CHECKPOINT_SIZE
+    moved = table.c.id.in_(ids)
+    first_at, last_at, min_id, max_id, min_seq, max_seq = db.execute(
+        select(func.min(table.c.created_at), func.max(table.c.created_at), func.min(table.c.id),
+               func.max(table.c.id), func.min(table.c.seq), func.max(table.c.seq)).where(moved)
+    ).one()
+    blocks = Counter({
+        str(index * AUDIT_CHECKPOINT_SIZE + 1): n
+        for index, n in db.execute(select(block, func.count()).where(moved).group_by(block))
+    })
+    partition = db.query(AuditPartition).filter(AuditPartition.month == month).first()
+    if partition is None:
+        db.add(AuditPartition(
+            month=month, rows=len(ids), first_at=first_at, last_at=last_at, min_id=min_id, max_id=max_id,
+            min_seq=min_seq, max_seq=max_seq, blocks=dict(blocks), created_at=datetime.utcnow(),
+        ))
+        return
+    partition.rows += len(ids)
+    partition.first_at = min(partition.first_at, first_at)
+    partition.last_at = max(partition.last_at, last_at)
+    partition.min_id = min(partition.min_id, min_id)
+    partition.max_id = max(partition.max_id, max_id)
+    partition.min_seq = min(partition.min_seq, min_seq)
+    partition.max_seq = max(partition.max_seq, max_seq)
+    partition.blocks = dict(Counter(partition.blocks or {}) + blocks)
+
+
+def rotate_audit_partitions(db: Session, batch: int = AUDIT_PARTITION_BATCH) -> int:
+    """Move sealed audits of closed months out of `audits`; returns rows moved."""
+    sealed_to = db.query(func.max(AuditCheckpoint.end_seq)).scalar() or 0
+    this_month = _month_start(datetime.utcnow())
+    # SQLite assigns max(id) + 1 to new rows, so the newest audit stays put;
+    # otherwise ids already moved to a partition would be handed out again
+    newest_id = db.query(func.max(Audit.id)).scalar() or 0
+    moved = 0
+    while True:
+        rows = (
+            db.query(Audit.id, Audit.created_at)
+            .filter(Audit.created_at < this_month, Audit.seq <= sealed_to, Audit.id < newest_id)
+            .order_by(Audit.id)
+            .limit(batch)
+            .all()
+        )
+        if not rows:
+            break
+        by_month: Dict[str, List[int]] = {}
+        for audit_id, created_at in rows:
+            by_month.setdefault(_month(created_at), []).append(audit_id)
+        conn = db.connection()
+        for month, ids in by_month.items():
+            table = partition_table(month)
+            table.create(conn, checkfirst=True)
+            conn.execute(table.insert().from_select(
+                _COLUMNS, select(*(Audit.__table__.c[name] for name in _COLUMNS)).where(Audit.id.in_(ids))
+            ))
+            conn.execute(Audit.__table__.delete().where(Audit.id.in_(ids)))
+            _record(db, month, table, ids)
+        db.commit()
+        moved += len(rows)
+    return moved
+
+
+def drop_audit_partitions(db: Session, keep_months: int) -> List[str]:
+    """Drop partitions of months older than the last `keep_months`; returns
+    the months dropped."""
+    oldest = _month(_month_start(datetime.utcnow(), keep_months))
+    dropped = []
+    for partition in db.query(AuditPartition).filter(AuditPartition.month < oldest).order_by(AuditPartition.month).all():
+        month = partition.month
+        # a block's rows stay accounted for whether compacted or expired
+        for start, n in (partition.blocks or {}).items():
+            db.query(AuditCheckpoint).filter(AuditCheckpoint.start_seq == int(start)).update(
+                {AuditCheckpoint.compacted: AuditCheckpoint.compacted + n}, synchronize_session=False
+            )
+        table = partition_table(month)
+        table.drop(db.connection(), checkfirst=True)
+        db.delete(partition)
+        db.commit()
+        _partition_metadata.remove(table)
+        dropped.append(month)
+    return dropped
+
+
+def partition_sources(db: Session, before: datetime):
+    """(table, partition) pairs for `audits` and every partition holding rows
+    created before `before`; partition is None for `audits`."""
+    sources = [(Audit.__table__, None)]
+    for partition in db.query(AuditPartition).filter(AuditPartition.first_at < before).order_by(AuditPartition.month):
+        sources.append((partition_table(partition.month), partition))
+    return sources
+
+
+def release_rows(partition: AuditPartition, blocks: Counter) -> None:
+    """Account for rows removed from a partition by compaction."""
+    remaining = Counter(partition.blocks or {})
+    remaining.subtract({str(start): n for start, n in blocks.items()})
+    partition.blocks = {start: n for start, n in remaining.items() if n > 0}
+    partition.rows -= sum(blocks.values())
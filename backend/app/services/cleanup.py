@@ -6,14 +6,36 @@ from typing import Dict, Any
 from sqlalchemy.orm import Session
 
 from ..models.models import Stream, Token, Dataset, Audit
-from ..core.config import DATA_DIR
+from ..core.config import (
+    AUDIT_COMPACT_AFTER_DAYS,
+    AUDIT_PARQUET_EXPORT,
+    AUDIT_RETENTION_MONTHS,
+    DATA_DIR,
+    RECEIPT_JOB_TTL_HOURS,
+)
+from ..core.metrics import CLEANUP_SECONDS
+from .artifacts import invalidate_stream_artifacts
+from .audit_chain import ensure_checkpoints
+from .audit_compaction import compact_audits
+from .audit_parquet import export_audits_parquet
+from .audit_partitions import drop_audit_partitions, rotate_audit_partitions
+from .receipt_jobs import purge_receipt_jobs
+from .token_signing import revocations
 
 
 def cleanup_expired(db: Session) -> Dict[str, Any]:
+    with CLEANUP_SECONDS.time():
+        return _cleanup_expired(db)
+
+
+def _cleanup_expired(db: Session) -> Dict[str, Any]:
     now = datetime.utcnow()
     updated_streams = 0
     revoked_tokens = 0
     purged_files = 0
+    invalidated_artifacts = 0
+    stale_stream_ids = set()
+    revoked_token_ids = []
 
     # Expire streams past expires_at
     streams = db.query(Stream).all()
@@ -21,6 +43,7 @@ def cleanup_expired(db: Session) -> Dict[str, Any]:
         if s.expires_at and s.expires_at < now and s.status != "expired":
             s.status = "expired"
             updated_streams += 1
+            stale_stream_ids.add(s.id)
             db.add(Audit(
                 type="stream_expired",
                 actor="system",
@@ -40,16 +63,24 @@ def cleanup_expired(db: Session) -> Dict[str, Any]:
         if (t.expires_at and t.expires_at < now) or (related_stream and related_stream.status != "active"):
             t.revoked = True
             revoked_tokens += 1
+            revoked_token_ids.append(t.id)
+            stale_stream_ids.add(t.stream_id)
             db.add(Audit(
                 type="token_revoked",
                 actor="system",
                 message=f"Token {t.id} auto-revoked",
                 stream_id=t.stream_id,
-                meta={"expires_at": t.expires_at.isoformat() if t.expires_at else None},
+                meta={"tokenId": t.id, "expires_at": t.expires_at.isoformat() if t.expires_at else None},
                 created_at=now,
             ))
 
     db.commit()
+    for token_id in revoked_token_ids:
+        revocations.add(token_id)
+
+    # Drop materialized exports of expired streams and streams that lost a token
+    for stream_id in stale_stream_ids:
+        invalidated_artifacts += invalidate_stream_artifacts(stream_id)
 
     # Purge dataset files with no active streams
     datasets = db.query(Dataset).all()
@@ -77,10 +108,24 @@ def cleanup_expired(db: Session) -> Dict[str, Any]:
 
     db.commit()
 
+    purged_receipt_jobs = purge_receipt_jobs(RECEIPT_JOB_TTL_HOURS)
+    sealed_checkpoints = ensure_checkpoints(db)
+    archived = export_audits_parquet(db) if AUDIT_PARQUET_EXPORT else {}
+    compaction = compact_audits(db, AUDIT_COMPACT_AFTER_DAYS) if AUDIT_COMPACT_AFTER_DAYS > 0 else {}
+    partitioned_audits = rotate_audit_partitions(db)
+    dropped_partitions = drop_audit_partitions(db, AUDIT_RETENTION_MONTHS) if AUDIT_RETENTION_MONTHS > 0 else []
+
     return {
         "expired_streams": updated_streams,
         "revoked_tokens": revoked_tokens,
         "purged_dataset_files": purged_files,
+        "invalidated_artifacts": invalidated_artifacts,
+        "purged_receipt_jobs": purged_receipt_jobs,
+        "sealed_checkpoints": sealed_checkpoints,
+        **archived,
+        **compaction,
+        "partitioned_audits": partitioned_audits,
+        "dropped_partitions": dropped_partitions,
         "timestamp": now.isoformat(),
     }
 
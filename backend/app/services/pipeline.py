@@ -0,0 +1,161 @@
+from __future__ import annotations
+import hashlib
+import json
+from typing import TYPE_CHECKING, Optional
+
+from fastapi import HTTPException
+
+from ..core.config import DATA_DIR
+from ..core.metrics import PIPELINE_ROWS_IN, PIPELINE_ROWS_OUT, PIPELINE_STAGE_SECONDS
+from ..models.models import Dataset, Rule, Stream
+from .ratelimit import pipeline_admission
+from .singleflight import SingleFlight
+from .tracing import PipelineTrace
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Bump whenever data_processing changes what a rule produces, so cached
+# representations (ETags) from older code are not reused.
+PIPELINE_VERSION = "1"
+
+# Obfuscation options that draw random numbers on every run
+RANDOMIZED_OBFUSCATION = ("jitter", "dpNoise", "synthetic")
+
+# Concurrent requests for the same (dataset hash, rule hash, mode) share one
+# run, and distinct runs queue for a pipeline concurrency slot
+stream_flights = SingleFlight("pipeline_singleflight", admission=pipeline_admission.slot)
+
+
+def rule_hash(rule: Optional[Rule]) -> str:
+    """Canonical hash of the parts of a rule that shape stream output."""
+    if not rule:
+        return "none"
+    payload = {
+        "fields": rule.fields,
+        "filters": rule.filters,
+        "aggregations": rule.aggregations,
+        "obfuscation": rule.obfuscation,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def is_deterministic(rule: Optional[Rule]) -> bool:
+    if not rule or not rule.obfuscation:
+        return True
+    return not any(rule.obfuscation.get(key) for key in RANDOMIZED_OBFUSCATION)
+
+
+def stream_etag(stream: Stream, dataset: Dataset, rule: Optional[Rule], variant: str) -> Optional[str]:
+    """Strong ETag for a stream representation, or None if the rule is randomized.
+
+    `variant` distinguishes representations of the same data (preview vs.
+    export format and content coding).
+    """
+    if not is_deterministic(rule):
+        return None
+    parts = [
+        PIPELINE_VERSION,
+        dataset.sha256,
+        rule_hash(rule),
+        variant,
+        str(stream.id),
+        stream.status,
+        stream.expires_at.isoformat() if stream.expires_at else "",
+    ]
+    digest = hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    if not if_none_match or not etag:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    # If-None-Match uses the weak comparison function
+    return any(c[2:] == etag if c.startswith("W/") else c == etag for c in candidates)
+
+
+def dataset_path(dataset: Dataset):
+    csv_path = DATA_DIR / f"{dataset.id}.csv"
+    if not csv_path.exists():
+        raise HTTPException(status_code=404, detail="Dataset file not found")
+    return csv_path
+
+
+def _record_stage(span) -> None:
+    PIPELINE_STAGE_SECONDS.observe(span.wall_s, stage=span.name)
+    PIPELINE_ROWS_IN.inc(span.rows_in or 0, stage=span.name)
+    PIPELINE_ROWS_OUT.inc(span.rows_out or 0, stage=span.name)
+
+
+def _stage(trace: PipelineTrace, stage: str, fn, df: pd.DataFrame, arg) -> pd.DataFrame:
+    with trace.span(stage, rows_in=len(df)) as span:
+        out = fn(df, arg)
+        span.rows_out = len(out)
+    _record_stage(span)
+    return out
+
+
+def run_rule(df: pd.DataFrame, rule: Optional[Rule], trace: PipelineTrace) -> pd.DataFrame:
+    # imported here so pandas/numpy load on the first pipeline run, not at startup
+    from .data_processing import (
+        apply_filters,
+        apply_aggregations,
+        apply_obfuscation,
+        select_fields,
+        generate_synthetic,
+    )
+
+    if rule and rule.filters:
+        df = _stage(trace, "apply_filters", apply_filters, df, rule.filters)
+    if rule and rule.fields:
+        df = _stage(trace, "select_fields", select_fields, df, rule.fields)
+    if rule and rule.aggregations:
+        df = _stage(trace, "apply_aggregations", apply_aggregations, df, rule.aggregations)
+    if rule and rule.obfuscation:
+        df = _stage(trace, "apply_obfuscation", apply_obfuscation, df, rule.obfuscation)
+
+    # Optional synthetic generation mode (if configured on rule.obfuscation)
+    if rule and rule.obfuscation and rule.obfuscation.get("synthetic"):
+        df = _stage(trace, "generate_synthetic", generate_synthetic, df, rule.obfuscation.get("synthetic"))
+    return df
+
+
+def load_stream_frame(dataset: Dataset, rule: Optional[Rule], trace: PipelineTrace) -> pd.DataFrame:
+    """Read the dataset file and apply the stream's rule to it."""
+    import pandas as pd
+
+    csv_path = dataset_path(dataset)
+    with trace.span("read_csv", rows_in=0) as span:
+        try:
+            df = pd.read_csv(csv_path)
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail=f"Failed to read dataset: {exc}")
+        span.rows_out = len(df)
+    _record_stage(span)
+    return run_rule(df, rule, trace)
+
+
+def traced_stream_frame(dataset: Dataset, rule: Optional[Rule], mode: str, limit: Optional[int] = None):
+    """Run the pipeline under a fresh trace; returns (frame, trace)."""
+    trace = PipelineTrace(
+        "stream_pipeline",
+        attributes={"dgp.dataset_id": dataset.id, "dgp.rule_hash": rule_hash(rule)[:16], "dgp.mode": mode},
+    )
+    df = load_stream_frame(dataset, rule, trace)
+    if limit is not None:
+        df = df.head(limit)
+    return df, trace.finish(rows_out=len(df))
+
+
+async def compute_stream_frame(dataset: Dataset, rule: Optional[Rule], mode: str, fn, *args):
+    """Run `fn(*args)` in the threadpool, coalesced with identical in-flight calls.
+
+    Callers must treat the returned frame as read-only since it may be shared
+    with other requests.
+    """
+    key = (dataset.sha256, rule_hash(rule), mode)
+    return await stream_flights.do(key, fn, *args)
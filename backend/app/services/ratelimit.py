@@ -0,0 +1,240 @@
+"""Admission control for stream reads.
+
+Token buckets limit how often a token, a stream and the whole process may
+be read. PipelineAdmission caps how many pipelines run at once; requests
+beyond the cap queue for a slot until a deadline. Either way, overflow is
+answered with 429 and a Retry-After hint.
+"""
+from __future__ import annotations
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..core.config import (
+    PIPELINE_CONCURRENCY,
+    PIPELINE_QUEUE_TIMEOUT_S,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_DB,
+    RATE_LIMIT_GLOBAL,
+    RATE_LIMIT_MAX_WAIT_S,
+    RATE_LIMIT_STREAM,
+    RATE_LIMIT_TOKEN,
+)
+from ..core.metrics import ADMISSION_REJECTIONS, PIPELINE_SLOTS
+
+# (key, refill rate per second, burst capacity)
+Bucket = Tuple[str, float, float]
+
+
+def parse_limit(spec: Optional[str]) -> Optional[Tuple[float, float]]:
+    """'5:20' -> 5 requests/s with bursts of 20; '5' -> burst equal to rate."""
+    if not spec:
+        return None
+    rate, _, burst = spec.partition(":")
+    rate_f = float(rate)
+    burst_f = float(burst) if burst else max(rate_f, 1.0)
+    # a bucket that never refills, or never holds a whole token, would only answer 429 or fail
+    if rate_f <= 0 or burst_f < 1:
+        raise ValueError(f"Invalid rate limit {spec!r}: rate must be > 0 and burst >= 1")
+    return rate_f, burst_f
+
+
+def _too_many(limit: str, retry_after: float, detail: str) -> HTTPException:
+    ADMISSION_REJECTIONS.inc(limit=limit)
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def _take(
+    state: Dict[str, Tuple[float, float]], buckets: List[Bucket], now: float, max_wait: float
+) -> Tuple[float, Optional[str]]:
+    """Take one token from every bucket or none of them.
+
+    Returns (wait, None) when admitted, possibly after waiting `wait`
+    seconds for a reserved token, or (retry_after, key) for the bucket that
+    turned the request away. Buckets may go negative to hold reservations.
+    """
+    levels = {}
+    wait = 0.0
+    blocking = None
+    for key, rate, burst in buckets:
+        tokens, updated = state.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        levels[key] = tokens
+        if tokens < 1:
+            needed = (1 - tokens) / rate
+            if needed > wait:
+                wait, blocking = needed, key
+    if wait > max_wait:
+        return wait, blocking
+    for key, _, _ in buckets:
+        state[key] = (levels[key] - 1, now)
+    return wait, None
+
+
+class MemoryBuckets:
+    """Buckets in process memory. A missing key reads as a full bucket, so
+    buckets that have refilled are dropped by a periodic sweep."""
+
+    SWEEP_INTERVAL_S = 60.0
+
+    def __init__(self) -> None:
+        self._state: Dict[str, Tuple[float, float]] = {}
+        # when each bucket is full again
+        self._full_at: Dict[str, float] = {}
+        self._swept = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, buckets: List[Bucket], max_wait: float) -> Tuple[float, Optional[str]]:
+        with self._lock:
+            now = time.monotonic()
+            result = _take(self._state, buckets, now, max_wait)
+            if result[1] is None:
+                for key, rate, burst in buckets:
+                    self._full_at[key] = now + (burst - self._state[key][0]) / rate
+            if now - self._swept >= self.SWEEP_INTERVAL_S:
+                self._sweep(now)
+            return result
+
+    def _sweep(self, now: float) -> None:
+        for key in [key for key, full_at in self._full_at.items() if full_at <= now]:
+            del self._state[key]
+            del self._full_at[key]
+        self._swept = now
+
+
+class SQLiteBuckets:
+    """Buckets in a small SQLite file shared by the workers on one host."""
+
+    def __init__(self, path) -> None:
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def take(self, buckets: List[Bucket], max_wait: float) -> Tuple[float, Optional[str]]:
+        conn = self._conn()
+        keys = [b[0] for b in buckets]
+        # IMMEDIATE takes the write lock up front so read-modify-write is atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT key, tokens, updated FROM buckets WHERE key IN ({','.join('?' * len(keys))})", keys
+            ).fetchall()
+            state = {key: (tokens, updated) for key, tokens, updated in rows}
+            result = _take(state, buckets, time.time(), max_wait)
+            if result[1] is None:
+                conn.executemany(
+                    "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                    [(key, *state[key]) for key in keys],
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+
+class RateLimiter:
+    def __init__(self, backend, token_limit, stream_limit, global_limit, max_wait: float) -> None:
+        self.backend = backend
+        self.token_limit = token_limit
+        self.stream_limit = stream_limit
+        self.global_limit = global_limit
+        self.max_wait = max_wait
+
+    def buckets(self, token_id: int, stream_id: int) -> List[Bucket]:
+        buckets: List[Bucket] = []
+        if self.token_limit:
+            buckets.append((f"token:{token_id}", *self.token_limit))
+        if self.stream_limit:
+            buckets.append((f"stream:{stream_id}", *self.stream_limit))
+        if self.global_limit:
+            buckets.append(("global", *self.global_limit))
+        return buckets
+
+    async def admit(self, token_id: int, stream_id: int, db: Optional[Session] = None) -> None:
+        buckets = self.buckets(token_id, stream_id)
+        if not buckets:
+            return
+        # SQLiteBuckets may wait out another worker's write lock
+        wait, blocking = await run_in_threadpool(self.backend.take, buckets, self.max_wait)
+        if blocking is not None:
+            scope = blocking.split(":", 1)[0]
+            raise _too_many(scope, wait, f"Rate limit exceeded ({scope})")
+        if wait > 0:
+            if db is not None:
+                # don't hold a pooled connection while delayed; loaded rows
+                # are expired and reload on next access
+                db.rollback()
+            await asyncio.sleep(wait)
+
+
+class PipelineAdmission:
+    """Bounds concurrent pipeline runs; waiters queue up to a deadline."""
+
+    def __init__(self, limit: int, timeout: float) -> None:
+        self.limit = limit
+        self.timeout = timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._queued = 0
+        # moving average of slot hold time, for the Retry-After estimate
+        self._avg_hold = 1.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self.limit <= 0:
+            yield
+            return
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        self._queued += 1
+        PIPELINE_SLOTS.inc(state="queued")
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            retry_after = self._avg_hold * (self._queued / self.limit)
+            raise _too_many("pipeline_concurrency", retry_after, "Server busy, retry later")
+        finally:
+            self._queued -= 1
+            PIPELINE_SLOTS.dec(state="queued")
+        PIPELINE_SLOTS.inc(state="in_use")
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * (time.monotonic() - start)
+            PIPELINE_SLOTS.dec(state="in_use")
+            self._semaphore.release()
+
+
+rate_limiter = RateLimiter(
+    SQLiteBuckets(RATE_LIMIT_DB) if RATE_LIMIT_BACKEND == "sqlite" else MemoryBuckets(),
+    parse_limit(RATE_LIMIT_TOKEN),
+    parse_limit(RATE_LIMIT_STREAM),
+    parse_limit(RATE_LIMIT_GLOBAL),
+    RATE_LIMIT_MAX_WAIT_S,
+)
+pipeline_admission = PipelineAdmission(PIPELINE_CONCURRENCY, PIPELINE_QUEUE_TIMEOUT_S)
@@ -0,0 +1,111 @@
+"""Batch consent receipts rendered in worker processes and zipped.
+
+Receipt rendering (reportlab in particular) is CPU-bound and holds the GIL,
+so receipts for many streams are built in a process pool. The archive is
+written to the response as each receipt completes: zipfile writes data
+descriptors when its output cannot seek, so no entry is buffered beyond
+the one being added.
+"""
+from __future__ import annotations
+import json
+import multiprocessing
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from ..core.config import RECEIPT_BATCH_WORKERS
+from .receipts import render_receipt
+
+# Streams per batch request
+RECEIPT_BATCH_LIMIT = 1000
+
+# Receipts queued per worker; bounds memory when the client reads slowly
+_IN_FLIGHT_PER_WORKER = 2
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a server process with live threads and DB connections is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=RECEIPT_BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+class _Sink:
+    """Write-only file object whose contents are drained after each entry."""
+
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_receipt_zip(
+    stream_ids: List[int], format: str, appendix: bool = False, missing: Sequence[int] = ()
+) -> Iterator[bytes]:
+    """Yield a ZIP of receipts for `stream_ids`, in completion order.
+
+    The last entry, manifest.json, lists every stream with its file name or
+    the reason it has none, including the requested ids in `missing` that
+    have no stream.
+    """
+    pool = _get_pool()
+    sink = _Sink()
+    manifest: List[Dict] = [{"streamId": stream_id, "error": "Stream not found"} for stream_id in missing]
+    # PDFs are compressed already; HTML deflates well
+    compression = zipfile.ZIP_STORED if format == "pdf" else zipfile.ZIP_DEFLATED
+    pending: Dict[Future, int] = {}
+    queue = iter(stream_ids)
+    limit = max(1, RECEIPT_BATCH_WORKERS) * _IN_FLIGHT_PER_WORKER
+
+    try:
+        archive = zipfile.ZipFile(sink, "w", compression=compression)
+        while True:
+            for stream_id in queue:
+                pending[pool.submit(render_receipt, stream_id, format, appendix)] = stream_id
+                if len(pending) >= limit:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stream_id = pending.pop(future)
+                try:
+                    body = future.result()
+                except Exception as exc:
+                    manifest.append({"streamId": stream_id, "error": f"{type(exc).__name__}: {exc}"})
+                    continue
+                if body is None:
+                    manifest.append({"streamId": stream_id, "error": "Stream not found"})
+                    continue
+                name = f"consent_receipt_stream_{stream_id}.{format}"
+                archive.writestr(name, body)
+                manifest.append({"streamId": stream_id, "file": name, "sizeBytes": len(body)})
+                yield sink.drain()
+        archive.writestr("manifest.json", json.dumps({
+            "generatedAt": datetime.utcnow().isoformat() + "Z",
+            "format": format,
+            "appendix": appendix,
+            "receipts": manifest,
+        }, indent=2))
+        archive.close()
+        yield sink.drain()
+    finally:
+        # client went away: drop receipts not yet started
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,101 @@
+"""Cache of rendered consent receipts.
+
+A receipt is a pure function of the stream, its tokens and its audit
+events. Audit rows are only ever appended, moved into rollups by
+compaction or moved into monthly partitions, so the highest audit id for
+the stream plus a summary of token, rollup and partition state identifies
+one rendering. Receipt-generation
+audits are left out of both the version and the receipt itself, otherwise
+every render would invalidate its own cache entry.
+"""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from typing import Hashable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..core.config import RECEIPT_CACHE_MAX_CHARS, RECEIPT_CACHE_SIZE
+from ..models.models import AuditCheckpoint, AuditRollup, Stream, Token
+from .audit_partitions import partition_state, stream_audit_view
+
+RECEIPT_AUDIT_TYPE = "consent_receipt_generated"
+
+Body = Union[str, bytes]
+
+
+def receipt_version(db: Session, stream: Stream) -> Tuple:
+    log = stream_audit_view(db, stream.id)
+    max_audit_id = (
+        db.query(func.max(log.id))
+        .filter(log.stream_id == stream.id, log.type != RECEIPT_AUDIT_TYPE)
+        .scalar()
+    )
+    token_state = (
+        db.query(
+            func.count(Token.id),
+            func.max(Token.id),
+            func.coalesce(func.sum(Token.revoked), 0),
+            func.coalesce(func.sum(Token.consumed), 0),
+        )
+        .filter(Token.stream_id == stream.id)
+        .one()
+    )
+    # a new checkpoint can seal events the receipt lists
+    checkpoint_id = db.query(func.max(AuditCheckpoint.id)).scalar()
+    # compaction moves events into rollups without adding audits
+    rollup_state = (
+        db.query(func.count(AuditRollup.id), func.coalesce(func.sum(AuditRollup.count), 0))
+        .filter(AuditRollup.stream_id == stream.id)
+        .one()
+    )
+    return (
+        max_audit_id or 0, *token_state, stream.status, stream.expires_at, checkpoint_id or 0, *rollup_state,
+        # expired partitions take events with them
+        *partition_state(db),
+    )
+
+
+class ReceiptCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Body]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Body]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: Hashable, body: Body) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put_streamed(self, key: Hashable, chunks: Iterable[str], max_chars: int = RECEIPT_CACHE_MAX_CHARS) -> Iterator[str]:
+        """Pass `chunks` through, caching the joined body once it completes.
+
+        Bodies longer than `max_chars` are passed through without being kept.
+        """
+        parts: Optional[List[str]] = [] if self.max_entries > 0 else None
+        size = 0
+        for chunk in chunks:
+            if parts is not None:
+                size += len(chunk)
+                if size > max_chars:
+                    parts = None
+                else:
+                    parts.append(chunk)
+            yield chunk
+        if parts is not None:
+            self.put(key, "".join(parts))
+
+
+receipt_cache = ReceiptCache(RECEIPT_CACHE_SIZE)
@@ -0,0 +1,106 @@
+"""Background builds of large PDF receipts.
+
+Job state lives next to the output in RECEIPT_JOBS_DIR as a small JSON
+file, so any worker process can answer status polls and downloads.
+"""
+from __future__ import annotations
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..core.config import RECEIPT_JOB_WORKERS, RECEIPT_JOBS_DIR
+from ..core.db import SessionLocal
+from ..models.models import Stream
+from .receipts import build_receipt_pdf
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _status_path(job_id: str) -> Path:
+    return RECEIPT_JOBS_DIR / f"{job_id}.json"
+
+
+def job_pdf_path(job_id: str) -> Path:
+    return RECEIPT_JOBS_DIR / f"{job_id}.pdf"
+
+
+def _write_status(job_id: str, status: Dict[str, Any]) -> None:
+    tmp = RECEIPT_JOBS_DIR / f".{job_id}.{uuid.uuid4().hex}.tmp"
+    tmp.write_text(json.dumps(status))
+    os.replace(tmp, _status_path(job_id))
+
+
+def read_job(job_id: str) -> Optional[Dict[str, Any]]:
+    if not _JOB_ID.match(job_id):
+        return None
+    try:
+        return json.loads(_status_path(job_id).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def submit_receipt_job(stream_id: int, appendix: bool) -> Dict[str, Any]:
+    global _executor
+    RECEIPT_JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    status = {
+        "jobId": job_id,
+        "streamId": stream_id,
+        "appendix": appendix,
+        "status": "pending",
+        "createdAt": datetime.utcnow().isoformat(),
+    }
+    _write_status(job_id, status)
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=RECEIPT_JOB_WORKERS, thread_name_prefix="dgp-receipt")
+    _executor.submit(_run_job, dict(status))
+    return status
+
+
+def _run_job(status: Dict[str, Any]) -> None:
+    job_id = status["jobId"]
+    _write_status(job_id, {**status, "status": "running"})
+    db = SessionLocal()
+    try:
+        stream = db.query(Stream).filter(Stream.id == status["streamId"]).first()
+        if stream is None:
+            raise LookupError("Stream not found")
+        started = time.perf_counter()
+        pdf = build_receipt_pdf(db, stream, appendix=status["appendix"])
+        tmp = job_pdf_path(job_id).with_suffix(".pdf.tmp")
+        tmp.write_bytes(pdf)
+        os.replace(tmp, job_pdf_path(job_id))
+        _write_status(job_id, {
+            **status,
+            "status": "done",
+            "sizeBytes": len(pdf),
+            "buildMs": round((time.perf_counter() - started) * 1000, 1),
+            "finishedAt": datetime.utcnow().isoformat(),
+        })
+    except Exception as exc:
+        _write_status(job_id, {**status, "status": "failed", "error": str(exc), "finishedAt": datetime.utcnow().isoformat()})
+    finally:
+        db.close()
+
+
+def purge_receipt_jobs(max_age_hours: float) -> int:
+    """Delete job files older than `max_age_hours`; returns jobs removed."""
+    if not RECEIPT_JOBS_DIR.exists():
+        return 0
+    cutoff = time.time() - max_age_hours * 3600
+    purged = 0
+    for path in RECEIPT_JOBS_DIR.iterdir():
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                purged += path.suffix == ".json"
+        except OSError:
+            pass
+    return purged
@@ -0,0 +1,115 @@
+"""Loading consent receipt contents and building large receipts."""
+from __future__ import annotations
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..core.db import SessionLocal
+from ..models.models import Audit, AuditCheckpoint, Stream, Token
+from ..utils.receipts import generate_receipt_pdf, iter_receipt_html
+from .audit_chain import CheckpointIndex, stream_checkpoints
+from .audit_compaction import ACCESS_EVENT_TYPES, stream_rollups
+from .audit_partitions import stream_audit_view
+from .receipt_cache import RECEIPT_AUDIT_TYPE
+from .stream_usage import stream_usage
+
+EVENT_BATCH_ROWS = 1000
+
+
+def receipt_tokens(db: Session, stream_id: int) -> Iterator[Token]:
+    return db.query(Token).filter(Token.stream_id == stream_id).order_by(Token.id).yield_per(EVENT_BATCH_ROWS)
+
+
+def iter_receipt_events(db: Session, stream_id: int, include_access: bool = True) -> Iterator[Audit]:
+    """The stream's receipt events in time order, fetched in batches."""
+    log = stream_audit_view(db, stream_id)
+    query = db.query(log).filter(log.stream_id == stream_id, log.type != RECEIPT_AUDIT_TYPE)
+    if not include_access:
+        query = query.filter(log.type.notin_(ACCESS_EVENT_TYPES))
+    return query.order_by(log.created_at, log.id).yield_per(EVENT_BATCH_ROWS)
+
+
+def daily_access_summary(db: Session, stream_id: int) -> List[Tuple[str, str, int]]:
+    """(day, type, count) of access events, raw and compacted together."""
+    log = stream_audit_view(db, stream_id)
+    day = func.date(log.created_at)
+    counts: Dict[Tuple[str, str], int] = {}
+    raw = (
+        db.query(day, log.type, func.count(log.id))
+        .filter(log.stream_id == stream_id, log.type.in_(ACCESS_EVENT_TYPES))
+        .group_by(day, log.type)
+    )
+    for d, kind, count in raw:
+        counts[(str(d), kind)] = counts.get((str(d), kind), 0) + count
+    for rollup in stream_rollups(db, stream_id):
+        counts[(rollup.day, rollup.type)] = counts.get((rollup.day, rollup.type), 0) + rollup.count
+    return [(d, kind, count) for (d, kind), count in sorted(counts.items())]
+
+
+def pdf_receipt_rows(db: Session, stream_id: int, appendix: bool) -> int:
+    """Event rows a PDF receipt would list; used to decide on a background build."""
+    log = stream_audit_view(db, stream_id)
+    query = db.query(func.count(log.id)).filter(log.stream_id == stream_id, log.type != RECEIPT_AUDIT_TYPE)
+    if not appendix:
+        query = query.filter(log.type.notin_(ACCESS_EVENT_TYPES))
+    tokens = db.query(func.count(Token.id)).filter(Token.stream_id == stream_id).scalar() or 0
+    return (query.scalar() or 0) + tokens
+
+
+def build_receipt_pdf(db: Session, stream: Stream, appendix: bool = False) -> bytes:
+    return generate_receipt_pdf(
+        stream=stream,
+        dataset=stream.dataset,
+        rule=stream.rule,
+        tokens=receipt_tokens(db, stream.id),
+        events=iter_receipt_events(db, stream.id, include_access=False),
+        access_summary=daily_access_summary(db, stream.id),
+        appendix_events=iter_receipt_events(db, stream.id) if appendix else None,
+        checkpoints=stream_checkpoints(db, stream.id),
+        usage=stream_usage(db, stream.id),
+    )
+
+
+def _iter_checkpoints(db: Session, stream_id: int) -> Iterator[AuditCheckpoint]:
+    # deferred until the events have been sent
+    yield from stream_checkpoints(db, stream_id)
+
+
+def stream_receipt_html(stream_id: int, proofs: bool = False) -> Iterator[str]:
+    """HTML receipt fragments read through batched cursors.
+
+    Runs on its own session: the response body is iterated after the
+    request's session has been closed.
+    """
+    db = SessionLocal()
+    try:
+        stream = db.query(Stream).filter(Stream.id == stream_id).first()
+        if stream is None:
+            return
+        yield from iter_receipt_html(
+            stream=stream,
+            dataset=stream.dataset,
+            rule=stream.rule,
+            tokens=receipt_tokens(db, stream_id),
+            events=iter_receipt_events(db, stream_id),
+            rollups=stream_rollups(db, stream_id),
+            checkpoints=_iter_checkpoints(db, stream_id),
+            proof_for=CheckpointIndex(db).proof if proofs else None,
+            usage=stream_usage(db, stream_id),
+        )
+    finally:
+        db.close()
+
+
+def render_receipt(stream_id: int, format: str, appendix: bool = False) -> Optional[bytes]:
+    """One complete receipt on a fresh session; None if the stream is gone."""
+    if format == "html":
+        body = "".join(stream_receipt_html(stream_id))
+        return body.encode("utf-8") if body else None
+    db = SessionLocal()
+    try:
+        stream = db.query(Stream).filter(Stream.id == stream_id).first()
+        return build_receipt_pdf(db, stream, appendix=appendix) if stream else None
+    finally:
+        db.close()
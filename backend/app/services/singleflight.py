@@ -0,0 +1,53 @@
+from __future__ import annotations
+import asyncio
+from typing import Any, AsyncContextManager, Callable, Dict, Hashable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from ..core.metrics import CACHE_LOOKUPS
+
+
+class SingleFlight:
+    """Coalesce concurrent identical computations into one threadpool call.
+
+    The first caller for a key starts `fn` in the threadpool; callers that
+    arrive while it is running await the same task instead of starting their
+    own. The key is forgotten as soon as the call finishes, so nothing is
+    cached beyond the lifetime of the in-flight computation.
+
+    With `admission`, an async context manager factory, each run first waits
+    for admission, so only distinct computations count against the limit.
+    """
+
+    def __init__(self, name: str, admission: Optional[Callable[[], AsyncContextManager[Any]]] = None) -> None:
+        self.name = name
+        self.admission = admission
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args: Any) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+            task = asyncio.ensure_future(self._run(fn, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            CACHE_LOOKUPS.inc(cache=self.name, result="hit")
+        # Shield so a disconnecting caller does not cancel the shared work
+        return await asyncio.shield(task)
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.admission is None:
+            return await run_in_threadpool(fn, *args)
+        async with self.admission():
+            return await run_in_threadpool(fn, *args)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # mark the exception retrieved even if every waiter went away
+            task.exception()
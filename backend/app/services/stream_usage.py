@@ -0,0 +1,132 @@
+"""Per-stream usage counters maintained as access audits are written.
+
+Every stream_accessed or stream_exported audit added through a session is
+folded into the stream's StreamUsage row by an upsert in the same flush,
+so the counters commit or roll back together with the audit and reading
+them is a primary-key lookup instead of a scan over audits and their meta.
+Compaction and partition retention leave the counters alone: they cover
+the stream's whole life.
+"""
+from __future__ import annotations
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from ..core.db import SessionLocal
+from ..models.models import Audit, AuditRollup, StreamUsage
+from .audit_compaction import ACCESS_EVENT_TYPES
+from .audit_partitions import audit_view
+
+_COUNTERS = ("accesses", "exports", "not_modified", "rows_served")
+
+
+def _empty() -> Dict[str, Any]:
+    return {name: 0 for name in _COUNTERS}
+
+
+def _later(column, value):
+    # SQLite's scalar max() is NULL if either side is NULL
+    return func.max(func.coalesce(column, value), func.coalesce(value, column))
+
+
+def _upsert(conn: Connection, usage: Dict[int, Dict[str, Any]], skip_existing: bool = False) -> None:
+    for stream_id, counts in usage.items():
+        stmt = sqlite_insert(StreamUsage).values(stream_id=stream_id, **counts)
+        if skip_existing:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[StreamUsage.stream_id])
+        else:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[StreamUsage.stream_id],
+                set_={
+                    **{name: getattr(StreamUsage, name) + getattr(stmt.excluded, name) for name in _COUNTERS},
+                    "first_used_at": func.min(func.coalesce(StreamUsage.first_used_at, stmt.excluded.first_used_at),
+                                              func.coalesce(stmt.excluded.first_used_at, StreamUsage.first_used_at)),
+                    "last_used_at": _later(StreamUsage.last_used_at, stmt.excluded.last_used_at),
+                    "last_accessed_at": _later(StreamUsage.last_accessed_at, stmt.excluded.last_accessed_at),
+                    "last_exported_at": _later(StreamUsage.last_exported_at, stmt.excluded.last_exported_at),
+                },
+            )
+        conn.execute(stmt)
+
+
+def _add(counts: Dict[str, Any], kind: str, at: datetime, n: int, rows: int, not_modified: int) -> None:
+    counts["accesses" if kind == "stream_accessed" else "exports"] += n
+    counts["rows_served"] += rows
+    counts["not_modified"] += not_modified
+    counts["first_used_at"] = min(filter(None, (counts.get("first_used_at"), at)))
+    counts["last_used_at"] = max(filter(None, (counts.get("last_used_at"), at)))
+    last = "last_accessed_at" if kind == "stream_accessed" else "last_exported_at"
+    counts[last] = max(filter(None, (counts.get(last), at)))
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _count_stream_usage(session: Session, flush_context, instances) -> None:
+    usage: Dict[int, Dict[str, Any]] = {}
+    for obj in session.new:
+        if isinstance(obj, Audit) and obj.type in ACCESS_EVENT_TYPES and obj.stream_id is not None:
+            meta = obj.meta or {}
+            _add(usage.setdefault(obj.stream_id, _empty()), obj.type, obj.created_at or datetime.utcnow(), 1,
+                 int(meta.get("rowCount") or 0), int(bool(meta.get("notModified"))))
+    if usage:
+        _upsert(session.connection(), usage)
+
+
+def stream_usage(db: Session, stream_id: int) -> Optional[StreamUsage]:
+    return db.get(StreamUsage, stream_id)
+
+
+def backfill_stream_usage(db: Session) -> int:
+    """Build the counters from the audit log and rollups when the table is
+    still empty (first start after upgrading); returns streams filled."""
+    if db.query(StreamUsage.stream_id).first() is not None:
+        return 0
+    log = audit_view(db)
+    usage: Dict[int, Dict[str, Any]] = {}
+    raw = (
+        db.query(
+            log.stream_id,
+            log.type,
+            func.count(log.id),
+            func.coalesce(func.sum(func.json_extract(log.meta, "$.rowCount")), 0),
+            func.count(func.json_extract(log.meta, "$.notModified")),
+            func.min(log.created_at),
+            func.max(log.created_at),
+        )
+        .filter(log.type.in_(ACCESS_EVENT_TYPES), log.stream_id.isnot(None))
+        .group_by(log.stream_id, log.type)
+    )
+    for stream_id, kind, n, rows, not_modified, first_at, last_at in raw:
+        counts = usage.setdefault(stream_id, _empty())
+        _add(counts, kind, first_at, n, int(rows), not_modified)
+        _add(counts, kind, last_at, 0, 0, 0)
+    for r in db.query(AuditRollup):
+        counts = usage.setdefault(r.stream_id, _empty())
+        _add(counts, r.type, r.first_at, r.count, r.rows_served, r.not_modified)
+        _add(counts, r.type, r.last_at, 0, 0, 0)
+    # requests served meanwhile already hold their own counts
+    _upsert(db.connection(), usage, skip_existing=True)
+    db.commit()
+    return len(usage)
+
+
+def usage_dict(usage: Optional[StreamUsage], stream_id: int) -> Dict[str, Any]:
+    usage = usage or StreamUsage(stream_id=stream_id, **_empty())
+
+    def iso(value: Optional[datetime]) -> Optional[str]:
+        return value.isoformat() if value else None
+
+    return {
+        "streamId": stream_id,
+        "accesses": usage.accesses,
+        "exports": usage.exports,
+        "notModified": usage.not_modified,
+        "rowsServed": usage.rows_served,
+        "firstUsedAt": iso(usage.first_used_at),
+        "lastUsedAt": iso(usage.last_used_at),
+        "lastAccessedAt": iso(usage.last_accessed_at),
+        "lastExportedAt": iso(usage.last_exported_at),
+    }
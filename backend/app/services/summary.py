@@ -0,0 +1,133 @@
+"""Dashboard summary computed with aggregate queries.
+
+Each figure is a COUNT/SUM over an indexed column (stream status and
+expiry, token revocation, audit time), so the cost does not grow with the
+size of the rows being counted and nothing is sent back but the numbers.
+The result is kept for SUMMARY_TTL_S seconds; dashboards polling the
+endpoint share one computation.
+"""
+from __future__ import annotations
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import Session
+
+from ..core.config import SUMMARY_TTL_S
+from ..core.metrics import CACHE_LOOKUPS
+from ..models.models import AuditRollup, Dataset, Rule, Stream, StreamUsage, Token
+from .audit_partitions import audit_view
+
+EXPIRING_SOON_HOURS = 24
+ACTIVITY_DAYS = 14
+RECENT_EVENTS = 10
+
+
+def _count_when(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def compute_summary(db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+    now = now or datetime.utcnow()
+    soon = now + timedelta(hours=EXPIRING_SOON_HOURS)
+    first_day = (now - timedelta(days=ACTIVITY_DAYS - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    by_status = dict(db.query(Stream.status, func.count(Stream.id)).group_by(Stream.status))
+    expiring_soon = (
+        db.query(func.count(Stream.id))
+        .filter(Stream.status == "active", Stream.expires_at > now, Stream.expires_at <= soon)
+        .scalar()
+    )
+    total, active, revoked, consumed, expired, one_time = db.query(
+        func.count(Token.id),
+        _count_when(and_(Token.revoked.is_(False), Token.consumed.is_(False),
+                         or_(Token.expires_at.is_(None), Token.expires_at >= now))),
+        _count_when(Token.revoked.is_(True)),
+        _count_when(Token.consumed.is_(True)),
+        _count_when(and_(Token.revoked.is_(False), Token.expires_at < now)),
+        _count_when(Token.one_time.is_(True)),
+    ).one()
+    accesses, exports, rows_served = db.query(
+        func.coalesce(func.sum(StreamUsage.accesses), 0),
+        func.coalesce(func.sum(StreamUsage.exports), 0),
+        func.coalesce(func.sum(StreamUsage.rows_served), 0),
+    ).one()
+
+    # per-day audit counts by type, raw rows and compacted rollups together
+    log = audit_view(db, since=first_day)
+    day = func.date(log.created_at)
+    activity: Dict[str, Dict[str, int]] = {
+        (first_day + timedelta(days=i)).strftime("%Y-%m-%d"): {} for i in range(ACTIVITY_DAYS)
+    }
+    raw = db.query(day, log.type, func.count(log.id)).filter(log.created_at >= first_day).group_by(day, log.type)
+    rolled = (
+        db.query(AuditRollup.day, AuditRollup.type, func.sum(AuditRollup.count))
+        .filter(AuditRollup.day >= first_day.strftime("%Y-%m-%d"))
+        .group_by(AuditRollup.day, AuditRollup.type)
+    )
+    for d, kind, count in [*raw, *rolled]:
+        counts = activity.setdefault(str(d), {})
+        counts[kind] = counts.get(kind, 0) + count
+    recent = db.query(log).filter(log.created_at >= first_day).order_by(log.created_at.desc(), log.id.desc()).limit(RECENT_EVENTS)
+
+    return {
+        "datasets": db.query(func.count(Dataset.id)).scalar(),
+        "rules": db.query(func.count(Rule.id)).scalar(),
+        "streams": {
+            "total": sum(by_status.values()),
+            "byStatus": by_status,
+            "active": by_status.get("active", 0),
+            "expiringSoon": expiring_soon,
+        },
+        "tokens": {
+            "total": total,
+            "active": active,
+            "revoked": revoked,
+            "expired": expired,
+            "consumed": consumed,
+            "oneTime": one_time,
+        },
+        "usage": {"accesses": accesses, "exports": exports, "rowsServed": rows_served},
+        "activity": [
+            {"day": d, "total": sum(counts.values()), "byType": counts} for d, counts in sorted(activity.items())
+        ],
+        "recentEvents": [
+            {
+                "id": e.id,
+                "type": e.type,
+                "actor": e.actor,
+                "message": e.message,
+                "streamId": e.stream_id,
+                "createdAt": e.created_at.isoformat(),
+            }
+            for e in recent
+        ],
+        "generatedAt": now.isoformat(),
+    }
+
+
+class SummaryCache:
+    def __init__(self, ttl_s: float) -> None:
+        self.ttl_s = ttl_s
+        self._entry: Optional[Tuple[float, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> Dict[str, Any]:
+        # computing under the lock lets concurrent misses wait for one result
+        with self._lock:
+            if self._entry is not None and time.monotonic() - self._entry[0] < self.ttl_s:
+                CACHE_LOOKUPS.inc(cache="summary", result="hit")
+                return self._entry[1]
+            CACHE_LOOKUPS.inc(cache="summary", result="miss")
+            summary = compute_summary(db)
+            self._entry = (time.monotonic(), summary)
+            return summary
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entry = None
+
+
+summary_cache = SummaryCache(SUMMARY_TTL_S)
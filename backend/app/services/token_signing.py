@@ -0,0 +1,187 @@
+"""HMAC-signed stream tokens and the in-memory revocation set.
+
+A signed token is ``dgp1.<kid>.<payload>.<signature>`` where the payload is
+base64url JSON carrying the token id, stream id, scope and expiry, and the
+signature is HMAC-SHA256 over everything before it under key ``kid``. Such a
+token is authenticated without reading the tokens table; revocation is then
+checked against RevocationSet, which every replica keeps in memory.
+"""
+from __future__ import annotations
+import base64
+import bisect
+import hashlib
+import hmac
+import json
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..core.config import TOKEN_KEYS, TOKEN_REVOCATION_REFRESH_S
+from ..models.models import Audit, AuditPartition, Token
+from .audit_partitions import audit_view
+
+SIGNED_PREFIX = "dgp1"
+
+_KEYS: Dict[str, bytes] = {kid: secret.encode("utf-8") for kid, secret in TOKEN_KEYS}
+
+
+class TokenClaims:
+    def __init__(
+        self,
+        token_id: int,
+        stream_id: int,
+        scope: List[str],
+        expires_at: Optional[datetime],
+        signed: bool,
+        one_time: bool = False,
+    ) -> None:
+        self.token_id = token_id
+        self.stream_id = stream_id
+        self.scope = scope
+        self.expires_at = expires_at
+        self.signed = signed
+        self.one_time = one_time
+
+
+def signing_enabled() -> bool:
+    return bool(TOKEN_KEYS)
+
+
+def is_signed(value: str) -> bool:
+    return value.startswith(SIGNED_PREFIX + ".")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _signature(kid: str, signing_input: str) -> str:
+    return _b64encode(hmac.new(_KEYS[kid], signing_input.encode("ascii"), hashlib.sha256).digest())
+
+
+def sign_token(token: Token) -> str:
+    kid = TOKEN_KEYS[0][0]
+    payload = {
+        "tid": token.id,
+        "sid": token.stream_id,
+        "scp": token.scope or [],
+        # expires_at is naive UTC
+        "exp": int(token.expires_at.replace(tzinfo=timezone.utc).timestamp()) if token.expires_at else None,
+    }
+    if token.one_time:
+        payload["ot"] = True
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    signing_input = f"{SIGNED_PREFIX}.{kid}.{body}"
+    return f"{signing_input}.{_signature(kid, signing_input)}"
+
+
+def verify_signed_token(value: str) -> Optional[TokenClaims]:
+    """Claims of a well-formed token signed with a known key, else None."""
+    # signatures are compared as ASCII; anything else cannot be ours
+    if not value.isascii():
+        return None
+    parts = value.split(".")
+    if len(parts) != 4 or parts[0] != SIGNED_PREFIX or parts[1] not in _KEYS:
+        return None
+    signing_input = ".".join(parts[:3])
+    if not hmac.compare_digest(parts[3], _signature(parts[1], signing_input)):
+        return None
+    try:
+        payload = json.loads(_b64decode(parts[2]))
+        expires_at = datetime.utcfromtimestamp(payload["exp"]) if payload.get("exp") is not None else None
+        return TokenClaims(
+            int(payload["tid"]),
+            int(payload["sid"]),
+            list(payload.get("scp") or []),
+            expires_at,
+            True,
+            one_time=bool(payload.get("ot")),
+        )
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class RevocationSet:
+    """Sorted array of revoked token ids, refreshed incrementally.
+
+    Every revocation writes a ``token_revoked`` audit in the same
+    transaction that flips ``tokens.revoked``, so audit ids serve as a change
+    log: a refresh only reads revocation audits above the last seen id. A
+    full reload from the tokens table happens on first use and whenever a
+    revocation audit does not name its token.
+    """
+
+    def __init__(self, refresh_interval: float) -> None:
+        self.refresh_interval = refresh_interval
+        self._ids = array("q")
+        self._watermark: Optional[int] = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def __contains__(self, token_id: int) -> bool:
+        i = bisect.bisect_left(self._ids, token_id)
+        return i < len(self._ids) and self._ids[i] == token_id
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, token_id: int) -> None:
+        with self._lock:
+            if token_id not in self:
+                bisect.insort(self._ids, token_id)
+
+    def discard(self, token_id: int) -> None:
+        with self._lock:
+            i = bisect.bisect_left(self._ids, token_id)
+            if i < len(self._ids) and self._ids[i] == token_id:
+                del self._ids[i]
+
+    def refresh(self, db: Session, force: bool = False) -> None:
+        if not force and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            if self._watermark is None:
+                self._reload(db)
+            else:
+                log = audit_view(db, after_id=self._watermark)
+                rows = (
+                    db.query(log.id, log.meta)
+                    .filter(log.type == "token_revoked", log.id > self._watermark)
+                    .order_by(log.id)
+                    .all()
+                )
+                token_ids = [(row.meta or {}).get("tokenId") for row in rows]
+                if any(tid is None for tid in token_ids):
+                    self._reload(db)
+                else:
+                    for tid in token_ids:
+                        i = bisect.bisect_left(self._ids, tid)
+                        if i == len(self._ids) or self._ids[i] != tid:
+                            self._ids.insert(i, tid)
+                    if rows:
+                        self._watermark = rows[-1].id
+            self._refreshed_at = time.monotonic()
+
+    def _reload(self, db: Session) -> None:
+        # Read the watermark first so revocations committed in between are
+        # picked up again by the next incremental refresh.
+        watermark = max(
+            db.query(Audit.id).order_by(Audit.id.desc()).limit(1).scalar() or 0,
+            # the newest audits may all have moved into a partition
+            db.query(func.max(AuditPartition.max_id)).scalar() or 0,
+        )
+        ids = sorted(row.id for row in db.query(Token.id).filter(Token.revoked.is_(True)))
+        self._ids = array("q", ids)
+        self._watermark = watermark
+
+
+revocations = RevocationSet(TOKEN_REVOCATION_REFRESH_S)
@@ -1,8 +1,16 @@
 from __future__ import annotations
 from datetime import datetime
 import secrets
+from typing import Any, Dict, List
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from ..models.models import Token, Stream
+from ..core.db import SessionLocal
+from ..core.metrics import AUDIT_WRITES, TOKEN_VALIDATIONS
+from ..models.models import Audit, Token, Stream
+from ..schemas.schemas import TokenBulkItem
+from .audit_chain import chain_rows
+from .token_signing import TokenClaims, is_signed, revocations, sign_token, signing_enabled, verify_signed_token
 from fastapi import HTTPException
 
 
@@ -42,32 +50,219 @@ def create_token(
         created_at=datetime.utcnow(),
     )
     db.add(token)
+    if signing_enabled():
+        # the signed form embeds the token id, so it needs the row first
+        db.flush()
+        token.token = sign_token(token)
     db.commit()
     db.refresh(token)
     return token
 
 
-def validate_stream_token(db: Session, stream_id: int, token_value: str) -> Token:
-    token: Token | None = db.query(Token).filter(Token.token == token_value).first()
-    if not token:
-        raise HTTPException(status_code=401, detail="Invalid token")
+# Upper bound on tokens per bulk request, and rows per IN (...) lookup
+BULK_TOKEN_LIMIT = 10_000
+_IN_BATCH = 500
 
-    if token.stream_id != stream_id:
-        raise HTTPException(status_code=401, detail="Token does not match stream")
 
-    if token.revoked:
-        raise HTTPException(status_code=401, detail="Token revoked")
+def _unique_token_strings(db: Session, count: int) -> List[str]:
+    """`count` fresh token strings not present in the tokens table.
 
-    if token.expires_at and token.expires_at < datetime.utcnow():
-        raise HTTPException(status_code=401, detail="Token expired")
+    Candidates are checked against the unique index in batches of IN
+    queries; colliding ones are redrawn.
+    """
+    values = list({generate_token_string(24) for _ in range(count)})
+    for _ in range(5):
+        taken = set()
+        for i in range(0, len(values), _IN_BATCH):
+            batch = values[i:i + _IN_BATCH]
+            taken.update(row.token for row in db.query(Token.token).filter(Token.token.in_(batch)))
+        values = [v for v in values if v not in taken]
+        if len(values) == count:
+            return values
+        values = list(set(values) | {generate_token_string(24) for _ in range(count - len(values))})
+    raise HTTPException(status_code=500, detail="Failed to generate unique tokens")
+
+
+def create_tokens_bulk(db: Session, items: List[TokenBulkItem]) -> List[Dict[str, Any]]:
+    """Issue tokens for several streams in one transaction, with one audit row each.
+
+    Rows are written with executemany inserts and their ids read back
+    through the unique token index; returns the token rows as dicts. The
+    caller commits, so the tokens and their audits land together or not at
+    all. An IntegrityError from a concurrent issuer taking one of the
+    strings between the check and the insert rolls the transaction back and
+    is retried with fresh strings.
+    """
+    total = sum(item.count for item in items)
+    if total > BULK_TOKEN_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_TOKEN_LIMIT} tokens per request")
+    stream_ids = {item.stream_id for item in items}
+    found = {row.id for row in db.query(Stream.id).filter(Stream.id.in_(stream_ids))}
+    missing = sorted(stream_ids - found)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Stream not found: {', '.join(map(str, missing))}")
+
+    now = datetime.utcnow()
+    for _ in range(5):
+        values = iter(_unique_token_strings(db, total))
+        rows = [
+            {
+                "stream_id": item.stream_id,
+                "token": next(values),
+                "scope": item.scope or [],
+                "expires_at": item.expires_at,
+                "one_time": bool(item.one_time),
+                "consumed": False,
+                "revoked": False,
+                "created_at": now,
+            }
+            for item in items
+            for _ in range(item.count)
+        ]
+        try:
+            db.execute(insert(Token), rows)
+            break
+        except IntegrityError:
+            # No SAVEPOINT: pysqlite would run it as the outermost transaction
+            # and commit the tokens on release, ahead of their audits. Nothing
+            # else has been written yet, so roll back and retry the whole unit.
+            db.rollback()
+    else:
+        raise HTTPException(status_code=500, detail="Failed to generate unique tokens")
+
+    ids = {}
+    for i in range(0, len(rows), _IN_BATCH):
+        batch = [row["token"] for row in rows[i:i + _IN_BATCH]]
+        ids.update((r.token, r.id) for r in db.query(Token.id, Token.token).filter(Token.token.in_(batch)))
+    for row in rows:
+        row["id"] = ids[row["token"]]
+
+    if signing_enabled():
+        for row in rows:
+            row["token"] = sign_token(Token(**row))
+        db.execute(update(Token), [{"id": row["id"], "token": row["token"]} for row in rows])
+
+    # Core bulk insert skips ORM events, so chain and count the audits here
+    audits = [
+        {
+            "type": "token_created",
+            "actor": "citizen",
+            "message": f"Token issued for stream {row['stream_id']}",
+            "stream_id": row["stream_id"],
+            "meta": {"tokenId": row["id"], "bulk": True},
+            "created_at": now,
+        }
+        for row in rows
+    ]
+    chain_rows(db, audits)
+    db.execute(insert(Audit), audits)
+    AUDIT_WRITES.inc(len(rows), type="token_created")
+    return rows
+
+
+def _reject(outcome: str, detail: str, status_code: int = 401) -> HTTPException:
+    TOKEN_VALIDATIONS.inc(outcome=outcome)
+    return HTTPException(status_code=status_code, detail=detail)
+
+
+def validate_stream_token(
+    db: Session,
+    stream_id: int,
+    token_value: str,
+    stream: Stream | None = None,
+    allow_consumed: bool = False,
+) -> TokenClaims:
+    """Authorize `token_value` for reads of `stream_id`.
+
+    Signed tokens are verified in memory against the signing keys and the
+    revocation set; other tokens are looked up in the tokens table. Pass the
+    already loaded `stream` to spare the stream query. `allow_consumed`
+    accepts a one-time token that has already been redeemed, for resuming
+    the download it paid for.
+    """
+    if is_signed(token_value):
+        claims = verify_signed_token(token_value)
+        if claims is None:
+            raise _reject("invalid", "Invalid token")
+        revocations.refresh(db)
+        revoked = claims.token_id in revocations
+        if revoked and claims.one_time and allow_consumed:
+            # consumed and revoked look alike in the revocation set
+            revoked = db.query(Token.revoked).filter(Token.id == claims.token_id).scalar() is not False
+    else:
+        token: Token | None = db.query(Token).filter(Token.token == token_value).first()
+        if not token:
+            raise _reject("invalid", "Invalid token")
+        claims = TokenClaims(token.id, token.stream_id, token.scope or [], token.expires_at, False, token.one_time)
+        revoked = token.revoked
+        if token.one_time and token.consumed and not allow_consumed:
+            raise _reject("consumed", "Token already used")
+
+    if claims.stream_id != stream_id:
+        raise _reject("stream_mismatch", "Token does not match stream")
+
+    if revoked:
+        if claims.one_time and claims.signed:
+            # consumed one-time tokens are added to the revocation set
+            raise _reject("consumed", "Token already used")
+        raise _reject("revoked", "Token revoked")
+
+    if claims.expires_at and claims.expires_at < datetime.utcnow():
+        raise _reject("expired", "Token expired")
 
     # Ensure stream is active and not expired
-    stream: Stream | None = db.query(Stream).filter(Stream.id == stream_id).first()
+    if stream is None or stream.id != stream_id:
+        stream = db.query(Stream).filter(Stream.id == stream_id).first()
     if not stream:
-        raise HTTPException(status_code=404, detail="Stream not found")
+        raise _reject("stream_not_found", "Stream not found", status_code=404)
     if stream.status in ("expired", "revoked"):
-        raise HTTPException(status_code=401, detail="Stream is not active")
+        raise _reject("stream_inactive", "Stream is not active")
     if stream.expires_at and stream.expires_at < datetime.utcnow():
-        raise HTTPException(status_code=401, detail="Stream expired")
+        raise _reject("stream_expired", "Stream expired")
+
+    TOKEN_VALIDATIONS.inc(outcome="valid")
+    return claims
+
+
+def redeem_one_time(db: Session, claims: TokenClaims) -> None:
+    """Consume a one-time token; no-op for reusable tokens.
+
+    A single conditional UPDATE decides concurrent redemptions: only the
+    request that flips `consumed` sees a row count of 1, everyone else is
+    rejected. Call it after admission checks so a throttled request does
+    not burn the token; the pipeline slot is only taken later, so a 429
+    from there is undone with release_one_time().
+    """
+    if not claims.one_time:
+        return
+    result = db.execute(
+        update(Token)
+        .where(Token.id == claims.token_id, Token.consumed.is_(False), Token.revoked.is_(False))
+        .values(consumed=True)
+    )
+    # commit now: the write lock must not be held across the pipeline run
+    db.commit()
+    if result.rowcount != 1:
+        raise _reject("consumed", "Token already used")
+    # later replays on this replica are refused without a database round trip
+    revocations.add(claims.token_id)
+
 
-    return token
\ No newline at end of file
+def release_one_time(claims: TokenClaims) -> None:
+    """Undo redeem_one_time for a request refused before it served data,
+    e.g. one throttled at the pipeline slot. Uses its own session: the
+    request's session is closed while the pipeline runs."""
+    if not claims.one_time:
+        return
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(Token)
+            .where(Token.id == claims.token_id, Token.consumed.is_(True), Token.revoked.is_(False))
+            .values(consumed=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+    if result.rowcount == 1:
+        revocations.discard(claims.token_id)
@@ -0,0 +1,147 @@
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from ..core.config import TRACE_EXPORT_PATH, TRACE_MEMORY
+
+_export_lock = threading.Lock()
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], rows_in: Optional[int]) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+        self.peak_bytes: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.start_ns = time.time_ns()
+        self.end_ns = self.start_ns
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+
+
+class PipelineTrace:
+    """Collects one span per pipeline stage under a root span.
+
+    CPU time is measured per thread, so it only covers the stage itself.
+    Peak memory uses tracemalloc and is only recorded when DGP_TRACE_MEMORY
+    is set; the tracemalloc peak is process-wide, so stages running
+    concurrently in other requests inflate each other's numbers.
+    """
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span(name, self.trace_id, None, None)
+        self.root.attributes.update(attributes or {})
+        self.spans: List[Span] = []
+        self._root_wall = time.perf_counter()
+        self._root_cpu = time.thread_time()
+        if TRACE_MEMORY and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def span(self, name: str, rows_in: Optional[int] = None) -> Iterator[Span]:
+        span = Span(name, self.trace_id, self.root.span_id, rows_in)
+        if TRACE_MEMORY:
+            tracemalloc.reset_peak()
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield span
+        finally:
+            span.wall_s = time.perf_counter() - wall
+            span.cpu_s = time.thread_time() - cpu
+            span.end_ns = time.time_ns()
+            if TRACE_MEMORY and tracemalloc.is_tracing():
+                span.peak_bytes = tracemalloc.get_traced_memory()[1]
+            self.spans.append(span)
+
+    def finish(self, rows_out: Optional[int] = None) -> "PipelineTrace":
+        self.root.rows_out = rows_out
+        self.root.wall_s = time.perf_counter() - self._root_wall
+        self.root.cpu_s = time.thread_time() - self._root_cpu
+        self.root.end_ns = time.time_ns()
+        if TRACE_EXPORT_PATH:
+            export_trace(self)
+        return self
+
+    def summary(self) -> Dict[str, Any]:
+        """Compact per-stage figures for audit meta."""
+        stages = []
+        for s in self.spans:
+            entry: Dict[str, Any] = {
+                "stage": s.name,
+                "ms": round(s.wall_s * 1000, 2),
+                "cpuMs": round(s.cpu_s * 1000, 2),
+                "rowsIn": s.rows_in,
+                "rowsOut": s.rows_out,
+            }
+            if s.peak_bytes is not None:
+                entry["peakKb"] = s.peak_bytes // 1024
+            stages.append(entry)
+        return {
+            "traceId": self.trace_id,
+            "totalMs": round(self.root.wall_s * 1000, 2),
+            "stages": stages,
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """The trace as an OTLP/JSON ExportTraceServiceRequest."""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attr("service.name", "dataguardian-proxy")]},
+                "scopeSpans": [{
+                    "scope": {"name": "dgp.pipeline"},
+                    "spans": [_otlp_span(s) for s in [self.root, *self.spans]],
+                }],
+            }]
+        }
+
+
+def _otlp_attr(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    attributes = dict(span.attributes)
+    attributes["dgp.cpu_time_ms"] = round(span.cpu_s * 1000, 3)
+    if span.rows_in is not None:
+        attributes["dgp.rows_in"] = span.rows_in
+    if span.rows_out is not None:
+        attributes["dgp.rows_out"] = span.rows_out
+    if span.peak_bytes is not None:
+        attributes["dgp.peak_memory_bytes"] = span.peak_bytes
+    out = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [_otlp_attr(k, v) for k, v in attributes.items()],
+    }
+    if span.parent_id:
+        out["parentSpanId"] = span.parent_id
+    return out
+
+
+def export_trace(trace: PipelineTrace) -> None:
+    """Append the trace to DGP_TRACE_EXPORT_PATH as one OTLP/JSON line."""
+    line = json.dumps(trace.to_otlp(), separators=(",", ":"))
+    with _export_lock:
+        with open(TRACE_EXPORT_PATH, "a") as f:
+            f.write(line + "\n")
@@ -0,0 +1,81 @@
+from __future__ import annotations
+import zlib
+from typing import Iterator, Optional
+
+from ..core.config import EXPORT_GZIP_LEVEL, EXPORT_ZSTD_LEVEL
+
+
+def _zstd_available() -> bool:
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the content coding for a response from an Accept-Encoding header.
+
+    Returns "zstd", "gzip" or None (identity). Ties go to zstd when the
+    zstandard package is installed.
+    """
+    if not accept_encoding:
+        return None
+    offered = {}
+    for part in accept_encoding.split(","):
+        pieces = part.strip().split(";")
+        coding = pieces[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in pieces[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        offered[coding] = q
+
+    wildcard = offered.get("*", 0.0)
+    candidates = []
+    if _zstd_available():
+        candidates.append("zstd")
+    candidates.append("gzip")
+
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = offered.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _gzip_chunks(chunks: Iterator[bytes], level: int) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        # sync flush so the client receives each batch as soon as it is ready
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush(zlib.Z_FINISH)
+
+
+def _zstd_chunks(chunks: Iterator[bytes], level: int) -> Iterator[bytes]:
+    import zstandard
+
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        if data:
+            yield data
+    yield compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def compress_chunks(chunks: Iterator[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """Compress an iterator of byte chunks incrementally with the given coding."""
+    if encoding == "gzip":
+        return _gzip_chunks(chunks, EXPORT_GZIP_LEVEL)
+    if encoding == "zstd":
+        return _zstd_chunks(chunks, EXPORT_ZSTD_LEVEL)
+    return chunks
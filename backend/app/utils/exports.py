@@ -0,0 +1,152 @@
+from __future__ import annotations
+import io
+from typing import TYPE_CHECKING, Iterator, List
+
+from fastapi import HTTPException
+
+from ..core.config import EXPORT_BATCH_ROWS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Parquet pages are already compressed; re-encoding them only costs CPU
+COMPRESSIBLE_FORMATS = {"csv", "json", "ndjson", "arrow"}
+
+EXPORT_EXTENSIONS = {
+    "csv": "csv",
+    "json": "json",
+    "ndjson": "ndjson",
+    "arrow": "arrows",
+    "parquet": "parquet",
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _iter_batches(df: pd.DataFrame, batch_rows: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), batch_rows):
+        yield df.iloc[start:start + batch_rows]
+
+
+def iter_csv(df: pd.DataFrame, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[bytes]:
+    yield df.head(0).to_csv(index=False).encode("utf-8")
+    for batch in _iter_batches(df, batch_rows):
+        yield batch.to_csv(index=False, header=False).encode("utf-8")
+
+
+def iter_ndjson(df: pd.DataFrame, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[bytes]:
+    for batch in _iter_batches(df, batch_rows):
+        text = batch.to_json(orient="records", lines=True, date_format="iso")
+        if not text.endswith("\n"):
+            text += "\n"
+        yield text.encode("utf-8")
+
+
+def iter_json(df: pd.DataFrame, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[bytes]:
+    # Emit one JSON array, serializing each batch separately and splicing the
+    # batch arrays together instead of building a list of dicts up front.
+    yield b"["
+    first = True
+    for batch in _iter_batches(df, batch_rows):
+        body = batch.to_json(orient="records", date_format="iso")[1:-1]
+        if not body:
+            continue
+        yield (body if first else "," + body).encode("utf-8")
+        first = False
+    yield b"]"
+
+
+def _arrow_schema(df: pd.DataFrame):
+    import pyarrow as pa
+
+    try:
+        return df, pa.Schema.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type object columns (e.g. k-anonymity "*" masking) have no
+        # single Arrow type; fall back to strings for those columns.
+        df = df.copy()
+        for col in df.columns:
+            if df[col].dtype == object:
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        return df, pa.Schema.from_pandas(df, preserve_index=False)
+
+
+def iter_arrow(df: pd.DataFrame, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[bytes]:
+    import pyarrow as pa
+
+    df, schema = _arrow_schema(df)
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in _iter_batches(df, batch_rows):
+            writer.write_batch(pa.RecordBatch.from_pandas(batch, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def iter_parquet(df: pd.DataFrame, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df, schema = _arrow_schema(df)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        # one row group per batch
+        for batch in _iter_batches(df, batch_rows):
+            writer.write_table(pa.Table.from_pandas(batch, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+_EXPORTERS = {
+    "csv": iter_csv,
+    "json": iter_json,
+    "ndjson": iter_ndjson,
+    "arrow": iter_arrow,
+    "parquet": iter_parquet,
+}
+
+
+def ensure_export_format(format: str) -> None:
+    """Fail before any work is done if the format's writer is not installed."""
+    if format in ("arrow", "parquet"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail=f"Export format '{format}' requires pyarrow")
+
+
+def iter_export(df: pd.DataFrame, format: str) -> Iterator[bytes]:
+    return _EXPORTERS[format](df)
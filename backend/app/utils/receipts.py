@@ -1,14 +1,14 @@
 from __future__ import annotations
 from datetime import datetime
-from typing import List, Optional
+from html import escape
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import mm
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 
-from ..models.models import Stream, Dataset, Rule, Token, Audit
+from ..models.models import Stream, Dataset, Rule, Token, Audit, AuditCheckpoint, AuditRollup, StreamUsage
+
+# Renderings are cached until the stream, its tokens or its events change,
+# so the time shown is when this rendering was built, not when it is served
+RENDERED_NOTE = "It is rendered again whenever the stream, its tokens or its events change."
 
 
 def _format_rule_summary(rule: Optional[Rule]) -> dict:
@@ -24,32 +24,14 @@ def _format_rule_summary(rule: Optional[Rule]) -> dict:
     }
 
 
-def render_receipt_html(
-    stream: Stream,
-    dataset: Optional[Dataset],
-    rule: Optional[Rule],
-    tokens: List[Token],
-    events: List[Audit],
-) -> str:
-    dataset_hash = dataset.sha256 if dataset else "N/A"
-    rule_summary = _format_rule_summary(rule)
-
-    token_rows = "".join(
-        f"<tr><td>{t.id}</td><td>{t.token}</td><td>{t.expires_at or ''}</td><td>{'yes' if t.one_time else 'no'}</td><td>{'yes' if t.revoked else 'no'}</td></tr>"
-        for t in tokens
-    )
-
-    event_rows = "".join(
-        f"<tr><td>{e.created_at}</td><td>{e.type}</td><td>{e.actor or ''}</td><td>{e.message or ''}</td></tr>"
-        for e in events
-    )
+# Table rows joined into one fragment when streaming HTML receipts
+HTML_CHUNK_ROWS = 500
 
-    html = f"""
-<!DOCTYPE html>
+_HTML_HEAD = """<!DOCTYPE html>
 <html>
 <head>
   <meta charset='utf-8' />
-  <title>Consent Receipt - Stream {stream.id}</title>
+  <title>Consent Receipt - Stream {stream_id}</title>
   <style>
     body {{ font-family: Arial, sans-serif; margin: 24px; color: #222; }}
     h1 {{ color: #111; }}
@@ -63,19 +45,20 @@ def render_receipt_html(
 </head>
 <body>
   <h1>Consent Receipt</h1>
-  <div class='meta'>Generated at {datetime.utcnow().isoformat()}Z</div>
+  <div class='meta'>Rendered at {generated_at}Z. {rendered_note}</div>
 
   <div class='section'>
     <h2>Stream Details</h2>
-    <div>ID: {stream.id}</div>
-    <div>Name: {stream.name}</div>
-    <div>Status: {stream.status}</div>
-    <div>Expires At: {stream.expires_at or ''}</div>
+    <div>ID: {stream_id}</div>
+    <div>Name: {stream_name}</div>
+    <div>Status: {stream_status}</div>
+    <div>Expires At: {stream_expires_at}</div>
+    <div>Usage: {stream_usage}</div>
   </div>
 
   <div class='section'>
     <h2>Dataset</h2>
-    <div>ID: {dataset.id if dataset else 'N/A'}</div>
+    <div>ID: {dataset_id}</div>
     <div>SHA-256: {dataset_hash}</div>
   </div>
 
@@ -89,40 +72,213 @@ def render_receipt_html(
     <table>
       <thead><tr><th>ID</th><th>Token</th><th>Expires At</th><th>One-Time</th><th>Revoked</th></tr></thead>
       <tbody>
-        {token_rows}
-      </tbody>
+"""
+
+_HTML_ROLLUPS = """      </tbody>
+    </table>
+  </div>
+
+  <div class='section'>
+    <h2>Compacted Access History</h2>
+    <div class='meta'>Older access events are kept as daily totals.</div>
+    <table>
+      <thead><tr><th>Day</th><th>Type</th><th>Count</th><th>Rows Served</th><th>Formats</th></tr></thead>
+      <tbody>
+"""
+
+_HTML_EVENTS = """      </tbody>
     </table>
   </div>
 
   <div class='section'>
     <h2>Audit Events</h2>
     <table>
-      <thead><tr><th>Time</th><th>Type</th><th>Actor</th><th>Message</th></tr></thead>
+      <thead><tr><th>Time</th><th>Type</th><th>Actor</th><th>Message</th><th>Seq</th><th>Hash</th>{proof_header}</tr></thead>
       <tbody>
-        {event_rows}
-      </tbody>
+"""
+
+_HTML_INTEGRITY = """      </tbody>
+    </table>
+  </div>
+
+  <div class='section'>
+    <h2>Integrity</h2>
+    <div class='meta'>Each event's hash covers its content and the hash of the audit entry before it.
+    Checkpoints seal blocks of entries under a Merkle root; an inclusion proof lists sibling hashes from
+    the event up to that root, each marked L or R by side. Verify with GET /audit/verify?stream_id={stream_id}.</div>
+    <table>
+      <thead><tr><th>Checkpoint</th><th>First Seq</th><th>Last Seq</th><th>Merkle Root</th></tr></thead>
+      <tbody>
+"""
+
+_HTML_TAIL = """      </tbody>
     </table>
   </div>
 </body>
 </html>
 """
-    return html
+
+
+def _html_row(*cells) -> str:
+    return "<tr>" + "".join(f"<td>{escape(str(c))}</td>" for c in cells) + "</tr>\n"
+
+
+def _html_chunks(rows: Iterable[str]) -> Iterator[str]:
+    batch: List[str] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= HTML_CHUNK_ROWS:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def iter_receipt_html(
+    stream: Stream,
+    dataset: Optional[Dataset],
+    rule: Optional[Rule],
+    tokens: Iterable[Token],
+    events: Iterable[Audit],
+    checkpoints: Iterable[AuditCheckpoint] = (),
+    proof_for: Optional[Callable[[int], Optional[Dict[str, Any]]]] = None,
+    rollups: Iterable[AuditRollup] = (),
+    usage: Optional[StreamUsage] = None,
+) -> Iterator[str]:
+    """Yield the HTML receipt in fragments.
+
+    Tokens and events are consumed lazily, so with batched database cursors
+    the first bytes go out before any event is read and memory stays bounded
+    by the chunk size. `checkpoints` is read after the events. With
+    `proof_for`, each event carries its Merkle inclusion proof. All values
+    are HTML-escaped.
+    """
+    yield _HTML_HEAD.format(
+        generated_at=datetime.utcnow().isoformat(),
+        rendered_note=RENDERED_NOTE,
+        stream_id=stream.id,
+        stream_name=escape(str(stream.name)),
+        stream_status=escape(str(stream.status)),
+        stream_expires_at=stream.expires_at or "",
+        stream_usage=escape(_usage_text(usage)),
+        dataset_id=dataset.id if dataset else "N/A",
+        dataset_hash=escape(dataset.sha256) if dataset else "N/A",
+        rule_summary=escape(str(_format_rule_summary(rule))),
+    )
+    yield from _html_chunks(
+        _html_row(t.id, t.token, t.expires_at or "", "yes" if t.one_time else "no", "yes" if t.revoked else "no")
+        for t in tokens
+    )
+    yield _HTML_ROLLUPS
+    yield from _html_chunks(
+        _html_row(r.day, r.type, r.count, r.rows_served,
+                  ", ".join(f"{fmt}: {n}" for fmt, n in sorted((r.formats or {}).items())))
+        for r in rollups
+    )
+    yield _HTML_EVENTS.format(proof_header="<th>Inclusion Proof</th>" if proof_for else "")
+    yield from _html_chunks(
+        _html_row(e.created_at, e.type, e.actor or "", e.message or "", e.seq or "", e.hash or "",
+                  *([_proof_text(proof_for(e.seq) if e.seq else None)] if proof_for else []))
+        for e in events
+    )
+    yield _HTML_INTEGRITY.format(stream_id=stream.id)
+    yield from _html_chunks(_html_row(c.id, c.start_seq, c.end_seq, c.root) for c in checkpoints)
+    yield _HTML_TAIL
+
+
+def _usage_text(usage: Optional[StreamUsage]) -> str:
+    if usage is None:
+        return "never used"
+    return (f"{usage.accesses} accesses, {usage.exports} exports, {usage.rows_served} rows served, "
+            f"last used {usage.last_used_at or ''}")
+
+
+def _proof_text(proof: Optional[Dict[str, Any]]) -> str:
+    if proof is None:
+        return "not yet sealed"
+    return f"checkpoint {proof['checkpoint']}: " + " ".join(proof["proof"])
+
+
+def render_receipt_html(
+    stream: Stream,
+    dataset: Optional[Dataset],
+    rule: Optional[Rule],
+    tokens: Iterable[Token],
+    events: Iterable[Audit],
+    checkpoints: Iterable[AuditCheckpoint] = (),
+    rollups: Iterable[AuditRollup] = (),
+    usage: Optional[StreamUsage] = None,
+) -> str:
+    return "".join(iter_receipt_html(stream, dataset, rule, tokens, events, checkpoints, rollups=rollups, usage=usage))
+
+
+# Rows per PDF table; reportlab lays out and splits each table as a unit, so
+# bounded tables keep build time linear in the number of rows
+RECEIPT_TABLE_ROWS = 200
+
+
+def _pdf_tables(header: List[str], rows: Iterable[List[str]], col_widths: List[float]) -> Iterator:
+    """Yield `rows` as a sequence of bounded tables, each repeating `header`."""
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    style = TableStyle([
+        ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
+        ('BACKGROUND', (0,0), (-1,0), colors.whitesmoke),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ])
+    batch = [header]
+    for row in rows:
+        batch.append(row)
+        if len(batch) > RECEIPT_TABLE_ROWS:
+            table = Table(batch, hAlign='LEFT', colWidths=col_widths, repeatRows=1)
+            table.setStyle(style)
+            yield table
+            batch = [header]
+    if len(batch) > 1:
+        table = Table(batch, hAlign='LEFT', colWidths=col_widths, repeatRows=1)
+        table.setStyle(style)
+        yield table
+
+
+def _event_rows(events: Iterable[Audit]) -> Iterator[List[str]]:
+    for ev in events:
+        yield [str(ev.created_at), ev.type, ev.actor or '', ev.message or '']
 
 
 def generate_receipt_pdf(
     stream: Stream,
     dataset: Optional[Dataset],
     rule: Optional[Rule],
-    tokens: List[Token],
-    events: List[Audit],
+    tokens: Iterable[Token],
+    events: Iterable[Audit],
+    access_summary: Optional[List[Tuple[str, str, int]]] = None,
+    appendix_events: Optional[Iterable[Audit]] = None,
+    checkpoints: Iterable[AuditCheckpoint] = (),
+    usage: Optional[StreamUsage] = None,
 ) -> bytes:
+    """Build the PDF receipt.
+
+    With `access_summary` ((day, type, count) rows), access events are shown
+    as per-day counts and `events` should hold only the remaining events.
+    `appendix_events`, when given, is listed in full at the end. Events may
+    be any iterable, e.g. a batched database cursor.
+    """
+    # reportlab is only needed for PDF receipts; import it on first use
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.lib import colors
+    from reportlab.platypus import PageBreak, SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=18 * mm, rightMargin=18 * mm, topMargin=18 * mm, bottomMargin=18 * mm)
     styles = getSampleStyleSheet()
+    event_widths = [45 * mm, 35 * mm, 20 * mm, 60 * mm]
 
     elements = []
     elements.append(Paragraph(f"Consent Receipt - Stream {stream.id}", styles['Title']))
-    elements.append(Paragraph(f"Generated at {datetime.utcnow().isoformat()}Z", styles['Normal']))
+    elements.append(Paragraph(f"Rendered at {datetime.utcnow().isoformat()}Z. {RENDERED_NOTE}", styles['Normal']))
     elements.append(Spacer(1, 8))
 
     # Stream Details
@@ -132,6 +288,7 @@ def generate_receipt_pdf(
         ["Name", stream.name],
         ["Status", stream.status],
         ["Expires At", str(stream.expires_at or '')],
+        ["Usage", _usage_text(usage)],
     ]
     t = Table(stream_data, hAlign='LEFT', colWidths=[80 * mm, 80 * mm])
     t.setStyle(TableStyle([
@@ -167,43 +324,51 @@ def generate_receipt_pdf(
 
     # Tokens table
     elements.append(Paragraph("Tokens", styles['Heading2']))
-    token_table_data = [["ID", "Token", "Expires At", "One-Time", "Revoked"]]
-    for tkn in tokens:
-        token_table_data.append([
-            str(tkn.id),
-            tkn.token,
-            str(tkn.expires_at or ''),
-            'yes' if tkn.one_time else 'no',
-            'yes' if tkn.revoked else 'no',
-        ])
-    t3 = Table(token_table_data, hAlign='LEFT', colWidths=[15 * mm, 65 * mm, 35 * mm, 25 * mm, 25 * mm])
-    t3.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
-        ('BACKGROUND', (0,0), (-1,0), colors.whitesmoke),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-    ]))
-    elements.append(t3)
+    token_rows = (
+        [str(tkn.id), tkn.token, str(tkn.expires_at or ''), 'yes' if tkn.one_time else 'no', 'yes' if tkn.revoked else 'no']
+        for tkn in tokens
+    )
+    elements.extend(_pdf_tables(
+        ["ID", "Token", "Expires At", "One-Time", "Revoked"],
+        token_rows,
+        [15 * mm, 65 * mm, 35 * mm, 25 * mm, 25 * mm],
+    ))
     elements.append(Spacer(1, 8))
 
-    # Audit events table
-    elements.append(Paragraph("Audit Events", styles['Heading2']))
-    event_table_data = [["Time", "Type", "Actor", "Message"]]
-    for ev in events:
-        event_table_data.append([
-            str(ev.created_at),
-            ev.type,
-            ev.actor or '',
-            ev.message or '',
-        ])
-    t4 = Table(event_table_data, hAlign='LEFT', colWidths=[45 * mm, 35 * mm, 20 * mm, 60 * mm])
-    t4.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
-        ('BACKGROUND', (0,0), (-1,0), colors.whitesmoke),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-    ]))
-    elements.append(t4)
+    # Access events summarized per day
+    if access_summary is not None:
+        elements.append(Paragraph("Data Access by Day", styles['Heading2']))
+        elements.extend(_pdf_tables(
+            ["Day", "Type", "Count"],
+            ([day, kind, str(count)] for day, kind, count in access_summary),
+            [45 * mm, 55 * mm, 25 * mm],
+        ))
+        elements.append(Spacer(1, 8))
+
+    # Audit events tables
+    elements.append(Paragraph("Audit Events" if access_summary is None else "Other Audit Events", styles['Heading2']))
+    elements.extend(_pdf_tables(["Time", "Type", "Actor", "Message"], _event_rows(events), event_widths))
+    elements.append(Spacer(1, 8))
+
+    # Merkle checkpoints sealing this stream's events
+    elements.append(Paragraph("Integrity", styles['Heading2']))
+    elements.append(Paragraph(
+        f"Audit entries are hash-chained and sealed in blocks under Merkle roots. "
+        f"Verify this stream's events with GET /audit/verify?stream_id={stream.id}.",
+        styles['Normal'],
+    ))
+    elements.extend(_pdf_tables(
+        ["Checkpoint", "Seq Range", "Merkle Root"],
+        ([str(c.id), f"{c.start_seq}-{c.end_seq}", Paragraph(c.root, styles['Code'])] for c in checkpoints),
+        [22 * mm, 35 * mm, 110 * mm],
+    ))
+
+    if appendix_events is not None:
+        elements.append(PageBreak())
+        elements.append(Paragraph("Appendix: Full Audit Log", styles['Heading2']))
+        elements.extend(_pdf_tables(["Time", "Type", "Actor", "Message"], _event_rows(appendix_events), event_widths))
 
     doc.build(elements)
     value = buffer.getvalue()
     buffer.close()
-    return value
\ No newline at end of file
+    return value
@@ -0,0 +1,209 @@
+"""Micro-benchmarks for app.services.data_processing.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_data_processing --rows 10000 1000000 10000000
+    python -m benchmarks.bench_data_processing --rows 10000 --save-baseline
+    python -m benchmarks.bench_data_processing --rows 10000 --baseline benchmarks/baseline.json
+
+Each case is timed separately on a dataset generated by benchmarks.synth and
+reports the median time over --repeat runs, throughput in input rows/s and
+the peak RSS reached while it ran. With --baseline, cases slower than the
+baseline by more than --threshold are flagged and the exit status is 1.
+"""
+from __future__ import annotations
+import argparse
+import json
+import platform
+import resource
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.services.data_processing import (
+    apply_aggregations,
+    apply_filters,
+    apply_obfuscation,
+    generate_synthetic,
+    select_fields,
+)
+
+from . import synth
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_DATA_DIR = BENCH_DIR / ".data"
+
+FILTERS = {
+    "gt": {"field": "steps", "op": "gt", "value": 5000},
+    "between": {"field": "risk_score", "op": "between", "value": [20, 80]},
+    "in": {"field": "city", "op": "in", "value": ["Mumbai", "Delhi", "Bengaluru", "Sydney", "London"]},
+    "rangeDate": {"field": "date_of_birth", "op": "rangeDate", "value": {"start": "1970-01-01", "end": "1999-12-31"}},
+    "contains": {"field": "email", "op": "contains", "value": "gmail"},
+}
+FIELDS = ["timestamp", "city", "steps", "heart_rate_avg", "sleep_hours", "transaction_amount", "risk_score"]
+AGGREGATIONS = [
+    {"op": "groupByDay", "field": "timestamp"},
+    {"op": "sum", "field": "steps"},
+    {"op": "avg", "field": "heart_rate_avg"},
+    {"op": "max", "field": "transaction_amount"},
+    {"op": "count", "field": "record_id"},
+]
+NUMERIC = ["steps", "heart_rate_avg", "sleep_hours", "transaction_amount"]
+OBFUSCATIONS = {
+    "dropPII": {"dropPII": True},
+    "bucketing": {"bucketing": {"field": "risk_score", "bins": [0, 25, 50, 75, 100], "labels": ["low", "mid", "high", "max"]}},
+    "rounding": {"rounding": {"nearest": 10, "fields": NUMERIC}},
+    "jitter": {"jitter": {"percent": 5, "fields": NUMERIC}},
+    "dpNoise": {"dpNoise": {"scale": 1.0, "fields": NUMERIC}},
+    "kAnonymity": {"kAnonymity": {"k": 5, "quasiIdentifiers": ["city", "device_os"]}},
+}
+
+
+def _cases() -> List[Tuple[str, Callable[[pd.DataFrame], Any]]]:
+    cases: List[Tuple[str, Callable[[pd.DataFrame], Any]]] = []
+    for name, spec in FILTERS.items():
+        cases.append((f"apply_filters.{name}", lambda df, f=spec: apply_filters(df, [f])))
+    cases.append(("apply_filters.all", lambda df: apply_filters(df, list(FILTERS.values()))))
+    cases.append(("select_fields", lambda df: select_fields(df, FIELDS)))
+    cases.append(("apply_aggregations", lambda df: apply_aggregations(df, AGGREGATIONS)))
+    for name, config in OBFUSCATIONS.items():
+        cases.append((f"apply_obfuscation.{name}", lambda df, c=config: apply_obfuscation(df, c)))
+    cases.append(("generate_synthetic", lambda df: generate_synthetic(df, {"rows": len(df), "shuffle": True})))
+    return cases
+
+
+def _reset_peak_rss() -> bool:
+    # Linux: writing 5 to clear_refs resets VmHWM for this process
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS; never resets
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_case(fn: Callable[[pd.DataFrame], Any], df: pd.DataFrame, repeat: int) -> Dict[str, Any]:
+    times = []
+    peak_resettable = _reset_peak_rss()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(df)
+            times.append(time.perf_counter() - start)
+    except Exception as exc:
+        return {"error": f"{type(exc).__name__}: {exc}"}
+    median = statistics.median(times)
+    return {
+        "median_s": round(median, 6),
+        "min_s": round(min(times), 6),
+        "rows_per_s": round(len(df) / median) if median > 0 else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "peak_rss_exact": peak_resettable,
+    }
+
+
+def run(rows_list: List[int], seed: int, repeat: int, data_dir: Path, only: Optional[str]) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for rows in rows_list:
+        csv_path = synth.dataset_csv(data_dir, rows, seed)
+        _reset_peak_rss()
+        start = time.perf_counter()
+        df = pd.read_csv(csv_path)
+        elapsed = time.perf_counter() - start
+        results[f"{rows}:read_csv"] = {
+            "median_s": round(elapsed, 6),
+            "rows_per_s": round(rows / elapsed),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        }
+        _print_row(rows, "read_csv", results[f"{rows}:read_csv"])
+        for name, fn in _cases():
+            if only and only not in name:
+                continue
+            result = run_case(fn, df, repeat)
+            results[f"{rows}:{name}"] = result
+            _print_row(rows, name, result)
+        del df
+    return results
+
+
+def _print_row(rows: int, name: str, result: Dict[str, Any]) -> None:
+    if "error" in result:
+        print(f"{rows:>10} {name:<32} ERROR {result['error']}")
+        return
+    print(
+        f"{rows:>10} {name:<32} {result['median_s'] * 1000:>10.1f} ms "
+        f"{result['rows_per_s'] or 0:>14,} rows/s {result['peak_rss_mb']:>9.1f} MB"
+    )
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get("results", {}).get(key)
+        if not base or "median_s" not in base or "median_s" not in result:
+            continue
+        ratio = result["median_s"] / base["median_s"] if base["median_s"] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append(f"{key}: {base['median_s'] * 1000:.1f} ms -> {result['median_s'] * 1000:.1f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="run only cases whose name contains this string")
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR)
+    parser.add_argument("--baseline", type=Path, help="compare against this baseline JSON")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, type=Path)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--output", type=Path, help="write results JSON here")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.seed, args.repeat, args.data_dir, args.only)
+    report = {
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(report, indent=2))
+        print(f"baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
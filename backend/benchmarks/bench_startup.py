@@ -0,0 +1,131 @@
+"""Cold-start benchmark: import time and time-to-first-response.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 10 --warmup off background blocking
+
+Every measurement uses a fresh interpreter. "import" is the time to import
+app.main, along with which heavy dependencies it loaded. "first_response"
+is the time from spawning uvicorn to the first 200 from `/`, and
+"first_heavy" is the latency of the first request that needs pandas (a
+dataset upload), for each DGP_WARMUP mode given.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+from . import synth
+from .loadtest import BACKEND_DIR, _free_port
+
+HEAVY_MODULES = ["pandas", "numpy", "reportlab", "pyarrow"]
+
+_IMPORT_PROBE = """
+import json, sys, time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def measure_import(env: Dict[str, str]) -> Dict[str, Any]:
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE % HEAVY_MODULES],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_first_response(env: Dict[str, str], csv_path: Path) -> Dict[str, float]:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {proc.returncode}")
+            if time.perf_counter() - start > 60:
+                raise RuntimeError("uvicorn did not respond within 60s")
+            try:
+                if httpx.get(f"{base_url}/", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                time.sleep(0.01)
+        first_response = time.perf_counter() - start
+
+        heavy_start = time.perf_counter()
+        with open(csv_path, "rb") as f:
+            response = httpx.post(
+                f"{base_url}/datasets/", data={"name": "startup"},
+                files={"file": (csv_path.name, f, "text/csv")}, timeout=60,
+            )
+        response.raise_for_status()
+        first_heavy = time.perf_counter() - heavy_start
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return {"first_response_s": first_response, "first_heavy_s": first_heavy}
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {"median_s": round(statistics.median(values), 4), "min_s": round(min(values), 4)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", nargs="+", default=["off", "background"],
+                        choices=["off", "background", "blocking"], help="DGP_WARMUP modes to compare")
+    parser.add_argument("--output", type=Path, help="write results JSON here")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {"repeat": args.repeat, "python": sys.version.split()[0], "results": {}}
+    with tempfile.TemporaryDirectory(prefix="dgp-startup-") as scratch:
+        base_env = dict(os.environ, DGP_DATA_DIR=f"{scratch}/data", DGP_DB_PATH=f"{scratch}/app.db")
+        base_env.pop("DGP_WARMUP", None)
+
+        imports = [measure_import(base_env) for _ in range(args.repeat)]
+        report["results"]["import"] = {
+            **_summary([r["seconds"] for r in imports]),
+            "heavy_modules_loaded": imports[-1]["loaded"],
+        }
+        print(f"import app.main        {report['results']['import']['median_s'] * 1000:8.1f} ms  "
+              f"heavy modules loaded: {', '.join(imports[-1]['loaded']) or 'none'}")
+
+        for mode in args.warmup:
+            env = dict(base_env)
+            if mode != "off":
+                env["DGP_WARMUP"] = mode
+            runs = [measure_first_response(env, synth.SAMPLE_CSV) for _ in range(args.repeat)]
+            result = {
+                "first_response": _summary([r["first_response_s"] for r in runs]),
+                "first_heavy": _summary([r["first_heavy_s"] for r in runs]),
+            }
+            report["results"][f"warmup={mode}"] = result
+            print(f"warmup={mode:<10}      first response {result['first_response']['median_s'] * 1000:8.1f} ms  "
+                  f"first heavy request {result['first_heavy']['median_s'] * 1000:8.1f} ms")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
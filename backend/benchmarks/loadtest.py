@@ -0,0 +1,351 @@
+"""End-to-end load test of the HTTP API.
+
+Run from the backend directory:
+
+    python -m benchmarks.loadtest --concurrency 16 --duration 30
+    python -m benchmarks.loadtest --server uvicorn --workers 4 --concurrency 64
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --requests 2000
+
+The app runs in-process over ASGI (default), under a local uvicorn started by
+the harness, or is an already running server given by --url. In-process and
+uvicorn runs use a scratch DGP_DATA_DIR / DGP_DB_PATH so the development
+database is never touched. The harness seeds datasets, rules, streams and
+tokens, then drives a weighted mix of previews, exports, token issuance,
+revocations, audit listing and receipts, and reports latency percentiles,
+throughput and error rate per endpoint.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from . import synth
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+DEFAULT_DATA_DIR = BENCH_DIR / ".data"
+
+# Relative weights of each operation in the mixed workload
+DEFAULT_MIX = {
+    "preview": 40,
+    "export": 15,
+    "issue_token": 15,
+    "revoke_token": 5,
+    "audit_list": 10,
+    "receipt": 15,
+}
+
+RULES = [
+    {"name": "lt-pii", "obfuscation": {"dropPII": True}},
+    {
+        "name": "lt-filtered",
+        "fields": ["timestamp", "city", "steps", "heart_rate_avg", "risk_score"],
+        "filters": [{"field": "steps", "op": "gt", "value": 5000}],
+        "obfuscation": {"rounding": {"nearest": 10, "fields": ["steps"]}},
+    },
+    {
+        "name": "lt-daily",
+        "aggregations": [
+            {"op": "groupByDay", "field": "timestamp"},
+            {"op": "sum", "field": "steps"},
+            {"op": "avg", "field": "heart_rate_avg"},
+        ],
+    },
+]
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, op: str, seconds: float, status: Optional[int]) -> None:
+        self.latencies[op].append(seconds)
+        if status is None:
+            self.errors[op] += 1
+            self.statuses[op][0] += 1
+            return
+        self.statuses[op][status] += 1
+        if status >= 400:
+            self.errors[op] += 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        for op in sorted(self.latencies):
+            samples = sorted(self.latencies[op])
+            count = len(samples)
+            endpoints[op] = {
+                "count": count,
+                "errors": self.errors[op],
+                "error_rate": round(self.errors[op] / count, 4),
+                "throughput_rps": round(count / elapsed, 2),
+                "p50_ms": round(_percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(_percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(_percentile(samples, 99) * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+                "statuses": {str(k): v for k, v in sorted(self.statuses[op].items())},
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        errors = sum(self.errors.values())
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+def _percentile(sorted_samples: List[float], pct: float) -> float:
+    # nearest-rank, so p99 is an observed latency rather than an interpolation
+    index = max(0, -(-len(sorted_samples) * pct // 100) - 1)
+    return sorted_samples[int(index)]
+
+
+class Workload:
+    def __init__(self, client: httpx.AsyncClient, streams: List[Tuple[int, str]], mix: Dict[str, int], seed: int) -> None:
+        self.client = client
+        self.streams = streams
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.rng = random.Random(seed)
+        # tokens issued during the run; revocations consume these so the
+        # seeded read tokens stay valid
+        self.issued: Deque[int] = deque()
+        self.stats = Stats()
+
+    async def _call(self, op: str, method: str, url: str, **kwargs: Any) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            await response.aread()
+        except httpx.HTTPError:
+            self.stats.record(op, time.perf_counter() - start, None)
+            return None
+        self.stats.record(op, time.perf_counter() - start, response.status_code)
+        return response
+
+    async def step(self) -> None:
+        op = self.rng.choices(self.ops, self.weights)[0]
+        stream_id, token = self.rng.choice(self.streams)
+        if op == "preview":
+            await self._call(op, "GET", f"/streams/{stream_id}/data", params={"token": token})
+        elif op == "export":
+            fmt = self.rng.choice(["csv", "json", "ndjson"])
+            await self._call(op, "GET", f"/streams/{stream_id}/export", params={"token": token, "format": fmt})
+        elif op == "issue_token":
+            response = await self._call(op, "POST", "/tokens/", json={"stream_id": stream_id, "scope": ["read"]})
+            if response is not None and response.status_code == 200:
+                self.issued.append(response.json()["id"])
+        elif op == "revoke_token":
+            if not self.issued:
+                response = await self.client.post("/tokens/", json={"stream_id": stream_id, "scope": ["read"]})
+                self.issued.append(response.json()["id"])
+            await self._call(op, "POST", f"/tokens/{self.issued.popleft()}/revoke")
+        elif op == "audit_list":
+            await self._call(op, "GET", "/audit/")
+        elif op == "receipt":
+            await self._call(op, "GET", f"/audit/{stream_id}/receipt", params={"format": "html"})
+
+
+async def seed(client: httpx.AsyncClient, csv_path: Path, streams: int) -> List[Tuple[int, str]]:
+    with open(csv_path, "rb") as f:
+        response = await client.post(
+            "/datasets/", data={"name": csv_path.stem}, files={"file": (csv_path.name, f, "text/csv")}
+        )
+    response.raise_for_status()
+    dataset_id = response.json()["id"]
+    rule_ids = []
+    for rule in RULES:
+        response = await client.post("/rules/", json=rule)
+        response.raise_for_status()
+        rule_ids.append(response.json()["id"])
+    seeded = []
+    for i in range(streams):
+        response = await client.post(
+            "/streams/",
+            json={"name": f"loadtest-{i}", "dataset_id": dataset_id, "rule_id": rule_ids[i % len(rule_ids)]},
+        )
+        response.raise_for_status()
+        stream_id = response.json()["id"]
+        response = await client.post("/tokens/", json={"stream_id": stream_id, "scope": ["read"]})
+        response.raise_for_status()
+        seeded.append((stream_id, response.json()["token"]))
+    return seeded
+
+
+async def drive(workload: Workload, concurrency: int, duration: Optional[float], requests: Optional[int]) -> float:
+    remaining = requests
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker() -> None:
+        nonlocal remaining
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if remaining is not None:
+                if remaining <= 0:
+                    return
+                remaining -= 1
+            await workload.step()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def _run_against(client: httpx.AsyncClient, args: argparse.Namespace, csv_path: Path) -> Dict[str, Any]:
+    streams = await seed(client, csv_path, args.streams)
+    workload = Workload(client, streams, args.mix, args.seed)
+    if args.warmup:
+        await drive(workload, args.concurrency, None, args.warmup)
+        workload.stats = Stats()
+    elapsed = await drive(workload, args.concurrency, args.duration, args.requests)
+    return workload.stats.report(elapsed)
+
+
+async def run_inprocess(args: argparse.Namespace, csv_path: Path) -> Dict[str, Any]:
+    # app config is read at import time, so the scratch env must be set first
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+            return await _run_against(client, args, csv_path)
+
+
+async def run_remote(args: argparse.Namespace, csv_path: Path, base_url: str) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        return await _run_against(client, args, csv_path)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_uvicorn(workers: int, env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    # create the schema up front: several workers racing create_all on a
+    # fresh SQLite file fails with "table already exists"
+    subprocess.run(
+        [sys.executable, "-c", "import asyncio; from app.main import on_startup; asyncio.run(on_startup())"],
+        cwd=BACKEND_DIR, env=env, check=True,
+    )
+    port = _free_port()
+    cmd = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+    ]
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {proc.returncode}")
+        try:
+            if httpx.get(f"{base_url}/", timeout=1).status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not become ready within 30s")
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"{'endpoint':<14} {'count':>7} {'err%':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for op, e in report["endpoints"].items():
+        print(
+            f"{op:<14} {e['count']:>7} {e['error_rate'] * 100:>6.2f} {e['throughput_rps']:>8.1f} "
+            f"{e['p50_ms']:>9.1f} {e['p95_ms']:>9.1f} {e['p99_ms']:>9.1f}"
+        )
+    print(
+        f"\n{report['requests']} requests in {report['elapsed_s']:.1f}s: "
+        f"{report['throughput_rps']:.1f} req/s, {report['error_rate'] * 100:.2f}% errors"
+    )
+
+
+def _parse_mix(value: str) -> Dict[str, int]:
+    mix = dict(DEFAULT_MIX)
+    for part in value.split(","):
+        op, _, weight = part.partition("=")
+        if op not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {op!r}")
+        mix[op] = int(weight)
+    return {op: w for op, w in mix.items() if w > 0}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--url", help="load an already running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, help="seconds to run (default: until --requests are sent)")
+    parser.add_argument("--requests", type=int, help="total requests to send (default 1000 without --duration)")
+    parser.add_argument("--warmup", type=int, default=50, help="requests sent before measuring")
+    parser.add_argument("--streams", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=10_000, help="rows in the seeded dataset")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mix", type=_parse_mix, default=dict(DEFAULT_MIX),
+                        help="operation weights, e.g. preview=60,export=0,receipt=5")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR, help="cache for generated datasets")
+    parser.add_argument("--max-error-rate", type=float, help="exit 1 when the overall error rate exceeds this")
+    parser.add_argument("--output", type=Path, help="write the report JSON here")
+    args = parser.parse_args()
+    if args.duration is None and args.requests is None:
+        args.requests = 1000
+
+    csv_path = synth.dataset_csv(args.data_dir, args.rows, args.seed)
+
+    if args.url:
+        report = asyncio.run(run_remote(args, csv_path, args.url.rstrip("/")))
+    else:
+        with tempfile.TemporaryDirectory(prefix="dgp-loadtest-") as scratch:
+            env = dict(os.environ, DGP_DATA_DIR=f"{scratch}/data", DGP_DB_PATH=f"{scratch}/app.db")
+            if args.server == "uvicorn":
+                proc, base_url = start_uvicorn(args.workers, env)
+                try:
+                    report = asyncio.run(run_remote(args, csv_path, base_url))
+                finally:
+                    proc.terminate()
+                    proc.wait(timeout=30)
+            else:
+                os.environ.update(env)
+                report = asyncio.run(run_inprocess(args, csv_path))
+
+    report["config"] = {
+        "server": "remote" if args.url else args.server,
+        "workers": args.workers,
+        "concurrency": args.concurrency,
+        "streams": args.streams,
+        "rows": args.rows,
+        "seed": args.seed,
+        "mix": args.mix,
+    }
+    _print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
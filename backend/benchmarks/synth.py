@@ -0,0 +1,163 @@
+"""Reproducible, scalable generator for the 38-column dgp_synth dataset schema.
+
+Distributions are taken from the bundled 10k-row sample: per-person columns
+(name, contact details, ids, location) are drawn from the sample's personas,
+categorical columns follow the sample's value frequencies, and numeric and
+time columns are drawn from the sample's ranges. Output is a pure function
+of (rows, seed, chunk_rows).
+"""
+from __future__ import annotations
+import argparse
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_CSV = Path(__file__).resolve().parents[2] / "public" / "samples" / "dgp_synth_10000.csv"
+
+COLUMNS = [
+    "record_id", "timestamp", "full_name", "email", "phone", "address", "ssn", "date_of_birth",
+    "city", "state", "postal_code", "country", "device_id", "app_name", "app_version",
+    "consent_opt_in", "purpose", "steps", "heart_rate_avg", "sleep_hours", "calories_burned",
+    "location_lat", "location_lng", "transaction_amount", "transaction_category", "merchant_name",
+    "payment_method", "ip_address", "email_verified", "phone_verified", "risk_score", "kyc_status",
+    "account_id", "last_login", "subscription_tier", "device_os", "data_source", "notes",
+]
+
+PERSONA_COLUMNS = [
+    "full_name", "email", "phone", "address", "ssn", "date_of_birth", "city", "state",
+    "postal_code", "country", "device_id", "account_id", "app_version",
+]
+
+CATEGORICAL_COLUMNS = [
+    "app_name", "consent_opt_in", "purpose", "payment_method", "email_verified", "phone_verified",
+    "kyc_status", "subscription_tier", "device_os", "data_source", "notes",
+]
+
+# (low, high) integer ranges, or (mean, std, low, high) for normal draws
+INT_COLUMNS = {
+    "steps": (9000, 3500, 0, 40000),
+    "heart_rate_avg": (72, 8, 40, 140),
+    "calories_burned": (450, 150, 0, 2000),
+    "risk_score": (0, 101),
+}
+
+
+class _Profile:
+    def __init__(self, sample: pd.DataFrame) -> None:
+        self.personas = sample.drop_duplicates("account_id")[PERSONA_COLUMNS + ["location_lat", "location_lng"]]
+        self.personas = self.personas.reset_index(drop=True)
+        self.categoricals: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for col in CATEGORICAL_COLUMNS:
+            counts = sample[col].value_counts(dropna=False, normalize=True)
+            self.categoricals[col] = (counts.index.to_numpy(dtype=object), counts.to_numpy())
+        merchants = sample.groupby("transaction_category")["merchant_name"].unique()
+        self.merchants = {k: np.asarray(v, dtype=object) for k, v in merchants.items()}
+        cat_counts = sample["transaction_category"].value_counts(normalize=True)
+        self.transaction_categories = (cat_counts.index.to_numpy(dtype=object), cat_counts.to_numpy())
+        self.amounts = sample["transaction_amount"].to_numpy()
+        self.sleep = sample["sleep_hours"].to_numpy()
+        ts = pd.to_datetime(sample["timestamp"], utc=True)
+        self.ts_min = int(ts.min().value // 10**9)
+        self.ts_max = int(ts.max().value // 10**9)
+        self.last_login_null = float(sample["last_login"].isna().mean())
+
+
+def _load_profile() -> _Profile:
+    return _Profile(pd.read_csv(SAMPLE_CSV))
+
+
+def _format_ts(seconds: np.ndarray) -> np.ndarray:
+    # numpy's ISO formatter is an order of magnitude faster than strftime
+    iso = np.datetime_as_string(seconds.astype("datetime64[s]"), unit="s")
+    return np.char.add(iso, "Z").astype(object)
+
+
+def _chunk(profile: _Profile, rng: np.random.Generator, start: int, n: int) -> pd.DataFrame:
+    people = profile.personas.iloc[rng.integers(0, len(profile.personas), n)].reset_index(drop=True)
+    ts = rng.integers(profile.ts_min, profile.ts_max, n)
+    login_offset = rng.integers(3600, 3600 * 24 * 60, n)
+    last_login = pd.Series(_format_ts(ts + login_offset), dtype=object)
+    last_login[rng.random(n) < profile.last_login_null] = None
+
+    data: Dict[str, object] = {
+        "record_id": np.arange(start + 1, start + n + 1),
+        "timestamp": _format_ts(ts),
+    }
+    for col in PERSONA_COLUMNS:
+        data[col] = people[col].to_numpy()
+    for col in CATEGORICAL_COLUMNS:
+        values, probs = profile.categoricals[col]
+        data[col] = values[rng.choice(len(values), n, p=probs)]
+    for col, spec in INT_COLUMNS.items():
+        if len(spec) == 2:
+            data[col] = rng.integers(spec[0], spec[1], n)
+        else:
+            mean, std, low, high = spec
+            data[col] = np.clip(rng.normal(mean, std, n), low, high).astype(np.int64)
+    data["sleep_hours"] = rng.choice(profile.sleep, n)
+    data["location_lat"] = np.round(people["location_lat"].to_numpy() + rng.normal(0, 0.05, n), 6)
+    data["location_lng"] = np.round(people["location_lng"].to_numpy() + rng.normal(0, 0.05, n), 6)
+    data["transaction_amount"] = np.round(rng.choice(profile.amounts, n) * rng.uniform(0.9, 1.1, n), 2)
+
+    cat_values, cat_probs = profile.transaction_categories
+    categories = cat_values[rng.choice(len(cat_values), n, p=cat_probs)]
+    merchants = np.empty(n, dtype=object)
+    for category in cat_values:
+        mask = categories == category
+        options = profile.merchants[category]
+        merchants[mask] = options[rng.integers(0, len(options), int(mask.sum()))]
+    data["transaction_category"] = categories
+    data["merchant_name"] = merchants
+
+    octets = rng.integers(1, 255, (n, 4)).astype(str)
+    data["ip_address"] = np.char.add(
+        np.char.add(np.char.add(octets[:, 0], "."), np.char.add(octets[:, 1], ".")),
+        np.char.add(np.char.add(octets[:, 2], "."), octets[:, 3]),
+    ).astype(object)
+    data["last_login"] = last_login.to_numpy()
+    return pd.DataFrame(data, columns=COLUMNS)
+
+
+def iter_chunks(rows: int, seed: int = 0, chunk_rows: int = 250_000) -> Iterator[pd.DataFrame]:
+    profile = _load_profile()
+    for index, start in enumerate(range(0, rows, chunk_rows)):
+        rng = np.random.default_rng([seed, index])
+        yield _chunk(profile, rng, start, min(chunk_rows, rows - start))
+
+
+def generate(rows: int, seed: int = 0, chunk_rows: int = 250_000) -> pd.DataFrame:
+    return pd.concat(iter_chunks(rows, seed, chunk_rows), ignore_index=True)
+
+
+def write_csv(path: Path, rows: int, seed: int = 0, chunk_rows: int = 250_000) -> Path:
+    """Stream a generated dataset to CSV without holding it all in memory."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", newline="") as f:
+        for i, chunk in enumerate(iter_chunks(rows, seed, chunk_rows)):
+            chunk.to_csv(f, index=False, header=(i == 0))
+    tmp.replace(path)
+    return path
+
+
+def dataset_csv(data_dir: Path, rows: int, seed: int = 0) -> Path:
+    """Path of a cached generated dataset, generating it on first use."""
+    path = data_dir / f"dgp_synth_{rows}_seed{seed}.csv"
+    if not path.exists():
+        write_csv(path, rows, seed)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a dgp_synth-schema CSV")
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_csv(args.output, args.rows, args.seed)
+
+
+if __name__ == "__main__":
+    main()
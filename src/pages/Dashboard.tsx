@@ -3,35 +3,36 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/com
 import { Badge } from "@/components/ui/badge";
 import { Button } from "@/components/ui/button";
 import { Activity, Database, Workflow, Key, Shield, TrendingUp } from "lucide-react";
-import { useDatasetStore, useStreamStore, useTokenStore, useRuleStore } from "@/stores";
 import { Link } from "react-router-dom";
+import { formatDistanceToNow } from "date-fns";
+import { api } from "@/services/api";
+import { DashboardSummary } from "@/types";
 
 export default function Dashboard() {
-  const { datasets } = useDatasetStore();
-  const { streams } = useStreamStore();
-  const { tokens } = useTokenStore();
-  const { rules } = useRuleStore();
-
-  const [stats, setStats] = useState({
-    activeStreams: 0,
-    expiringSoon: 0,
-    totalTokens: 0,
-    revokedTokens: 0,
-  });
+  // Totals come pre-aggregated from GET /summary instead of full entity lists
+  const [summary, setSummary] = useState<DashboardSummary | null>(null);
 
   useEffect(() => {
-    const now = new Date();
-    const twentyFourHoursFromNow = new Date(now.getTime() + 24 * 60 * 60 * 1000);
-
-    const activeStreams = streams.filter(s => s.status === 'active').length;
-    const expiringSoon = streams.filter(s => 
-      s.status === 'active' && new Date(s.expiresAt) <= twentyFourHoursFromNow
-    ).length;
-    const totalTokens = tokens.length;
-    const revokedTokens = tokens.filter(t => t.revoked).length;
+    let cancelled = false;
+    api.getSummary()
+      .then(response => {
+        if (!cancelled) setSummary(response.data);
+      })
+      .catch(error => console.error('Failed to load dashboard summary', error));
+    return () => {
+      cancelled = true;
+    };
+  }, []);
 
-    setStats({ activeStreams, expiringSoon, totalTokens, revokedTokens });
-  }, [streams, tokens]);
+  const stats = {
+    datasets: summary?.datasets ?? 0,
+    activeStreams: summary?.streams.active ?? 0,
+    expiringSoon: summary?.streams.expiringSoon ?? 0,
+    totalTokens: summary?.tokens.total ?? 0,
+    revokedTokens: summary?.tokens.revoked ?? 0,
+  };
+  const activity = summary?.activity ?? [];
+  const busiestDay = Math.max(1, ...activity.map(day => day.total));
 
   const StatCard = ({ title, value, description, icon: Icon, trend, color = "default" }: {
     title: string;
@@ -90,10 +91,9 @@ export default function Dashboard() {
       <div className="grid gap-4 md:grid-cols-2 lg:grid-cols-4">
         <StatCard
           title="Total Datasets"
-          value={datasets.length}
+          value={stats.datasets}
           description="Uploaded data sources"
           icon={Database}
-          trend={{ value: 12, label: "from last month" }}
           color="success"
         />
         <StatCard
@@ -179,6 +179,29 @@ export default function Dashboard() {
         </Card>
       </div>
 
+      {/* Activity over the last two weeks */}
+      <Card className="border-border/50">
+        <CardHeader>
+          <CardTitle>Activity</CardTitle>
+          <CardDescription>
+            Audit events per day
+            {summary && ` · ${summary.usage.accesses} accesses, ${summary.usage.exports} exports, ${summary.usage.rowsServed} rows served`}
+          </CardDescription>
+        </CardHeader>
+        <CardContent>
+          <div className="flex items-end gap-1 h-24">
+            {activity.map(day => (
+              <div
+                key={day.day}
+                title={`${day.day}: ${day.total} events`}
+                className="flex-1 bg-primary/70 rounded-t"
+                style={{ height: `${(day.total / busiestDay) * 100}%` }}
+              />
+            ))}
+          </div>
+        </CardContent>
+      </Card>
+
       {/* Recent Activity */}
       <Card className="border-border/50">
         <CardHeader>
@@ -187,23 +210,20 @@ export default function Dashboard() {
         </CardHeader>
         <CardContent>
           <div className="space-y-4">
-            {[
-              { action: "Dataset uploaded", detail: "fitness.csv", time: "2 minutes ago", type: "success" },
-              { action: "Stream created", detail: "Health Insights", time: "1 hour ago", type: "info" },
-              { action: "Token revoked", detail: "Mobile App Access", time: "3 hours ago", type: "warning" },
-              { action: "Rule updated", detail: "PII Protection", time: "1 day ago", type: "info" },
-            ].map((item, index) => (
-              <div key={index} className="flex items-center justify-between py-2 border-b border-border/30 last:border-0">
+            {(summary?.recentEvents ?? []).map(event => (
+              <div key={event.id} className="flex items-center justify-between py-2 border-b border-border/30 last:border-0">
                 <div className="flex items-center gap-3">
                   <Badge variant={
-                    item.type === 'success' ? 'default' :
-                    item.type === 'warning' ? 'destructive' : 'secondary'
+                    event.type.endsWith('created') ? 'default' :
+                    event.type.endsWith('revoked') || event.type.endsWith('expired') ? 'destructive' : 'secondary'
                   }>
-                    {item.action}
+                    {event.type.replace(/_/g, ' ')}
                   </Badge>
-                  <span className="text-sm">{item.detail}</span>
+                  <span className="text-sm">{event.message}</span>
                 </div>
-                <span className="text-xs text-muted-foreground">{item.time}</span>
+                <span className="text-xs text-muted-foreground">
+                  {formatDistanceToNow(new Date(event.createdAt), { addSuffix: true })}
+                </span>
               </div>
             ))}
           </div>
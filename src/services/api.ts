@@ -1,4 +1,4 @@
-import { Dataset, Rule, Stream, Token, AuditEvent, ParsedCSV, ApiResponse } from '@/types';
+import { Dataset, Rule, Stream, Token, AuditEvent, ParsedCSV, ApiResponse, DashboardSummary } from '@/types';
 import Papa from 'papaparse';
 import { useSettingsStore } from '@/stores';
 
@@ -346,6 +346,63 @@ class MockAPI {
       timestamp: new Date().toISOString()
     };
   }
+
+  async getSummary(): Promise<ApiResponse<DashboardSummary>> {
+    await delay(300);
+    const [{ data: datasets }, { data: rules }, { data: streams }, { data: tokens }, { data: events }] = await Promise.all([
+      this.getDatasets(), this.getRules(), this.getStreams(), this.getTokens(), this.getAuditEvents()
+    ]);
+    const now = new Date();
+    const soon = new Date(now.getTime() + 24 * 60 * 60 * 1000);
+    const byStatus: Record<string, number> = {};
+    streams.forEach(s => { byStatus[s.status] = (byStatus[s.status] || 0) + 1; });
+    const expired = tokens.filter(t => !t.revoked && new Date(t.expiresAt) < now).length;
+    const revoked = tokens.filter(t => t.revoked).length;
+
+    const activity = Array.from({ length: 14 }, (_, i) => {
+      const day = new Date(now.getTime() - (13 - i) * 24 * 60 * 60 * 1000).toISOString().slice(0, 10);
+      const byType: Record<string, number> = {};
+      events.filter(e => e.createdAt.slice(0, 10) === day).forEach(e => {
+        byType[e.type] = (byType[e.type] || 0) + 1;
+      });
+      return { day, total: Object.values(byType).reduce((a, b) => a + b, 0), byType };
+    });
+
+    return {
+      data: {
+        datasets: datasets.length,
+        rules: rules.length,
+        streams: {
+          total: streams.length,
+          byStatus,
+          active: byStatus.active || 0,
+          expiringSoon: streams.filter(s => {
+            const expiresAt = new Date(s.expiresAt);
+            return s.status === 'active' && expiresAt > now && expiresAt <= soon;
+          }).length,
+        },
+        tokens: {
+          total: tokens.length,
+          active: tokens.length - revoked - expired,
+          revoked,
+          expired,
+          consumed: 0,
+          oneTime: tokens.filter(t => t.oneTime).length,
+        },
+        usage: {
+          accesses: events.filter(e => e.type === 'stream_accessed').length,
+          exports: 0,
+          rowsServed: 0,
+        },
+        activity,
+        recentEvents: [...events]
+          .sort((a, b) => b.createdAt.localeCompare(a.createdAt))
+          .slice(0, 10),
+        generatedAt: now.toISOString(),
+      },
+      timestamp: now.toISOString()
+    };
+  }
 }
 
 // Real API implementation (for future use)
@@ -442,6 +499,10 @@ class RealAPI {
   async getAuditEvents(): Promise<ApiResponse<AuditEvent[]>> {
     return this.request<AuditEvent[]>('/audit');
   }
+
+  async getSummary(): Promise<ApiResponse<DashboardSummary>> {
+    return this.request<DashboardSummary>('/summary');
+  }
 }
 
 // API instance factory
@@ -92,6 +92,40 @@ export interface AuditEvent {
   severity?: "info" | "warning" | "error";
 }
 
+export interface DashboardSummary {
+  datasets: number;
+  rules: number;
+  streams: {
+    total: number;
+    byStatus: Record<string, number>;
+    active: number;
+    expiringSoon: number;
+  };
+  tokens: {
+    total: number;
+    active: number;
+    revoked: number;
+    expired: number;
+    consumed: number;
+    oneTime: number;
+  };
+  usage: {
+    accesses: number;
+    exports: number;
+    rowsServed: number;
+  };
+  activity: { day: string; total: number; byType: Record<string, number> }[];
+  recentEvents: {
+    id: number | string;
+    type: string;
+    actor?: string;
+    message?: string;
+    streamId?: number | string;
+    createdAt: string;
+  }[];
+  generatedAt: string;
+}
+
 export interface AppSettings {
   language: "en" | "hi" | "bn";
   theme: "light" | "dark" | "system";